@@ -0,0 +1,311 @@
+#    Copyright 2026, SIL International
+#    All rights reserved.
+#
+#    This library is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published
+#    by the Free Software Foundation; either version 2.1 of License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should also have received a copy of the GNU Lesser General Public
+#    License along with this library in the file named "LICENSE".
+#    If not, write to the Free Software Foundation, 51 Franklin Street,
+#    suite 500, Boston, MA 02110-1335, USA or visit their web page on the 
+#    internet at http://www.fsf.org/licenses/lgpl.html.
+
+
+# Golden output for a set of tests: the final glyphs and positions of each test, and
+# optionally which rules fired in each pass, recorded so that later builds of the font can
+# be compared against it. Nothing here uses Qt.
+#
+# A baseline file is a short header followed by a zlib stream of records, one per test:
+#   header:  'GRBL', version (H), flags (H), size (H), font hash (40 ascii)
+#   record:  input key (20s), label length (H), label (utf-8), glyph count (I),
+#            gids (H * n), x, y, advance in 1/64 units (i * 3n), before, after (i * 2n),
+#            and if flags & 1, pass count (H) then for each pass: rule count (H), rule ids (H * n)
+# The input key is a hash of everything that goes into shaping the test, so a record whose
+# key matches and whose font is unchanged does not need to be shaped again.
+
+from array import array
+from difflib import SequenceMatcher
+from graide.rungraphite import CorpusShaper
+from graide.shapecache import fontHash
+import hashlib, json, os, struct, sys, zlib
+
+magic = b'GRBL'
+version = 1
+flagPasses = 1
+headerStruct = struct.Struct('<4sHHH40s')
+recordStruct = struct.Struct('<20sH')
+
+def inputKey(test, size) :
+    data = [test.text, sorted((test.feats or {}).items()), test.lang or None, bool(test.rtl), test.expand, size]
+    return hashlib.sha1(json.dumps(data).encode('utf-8')).digest()
+
+# Tests are identified by the name of their file, without its directory, so that a baseline
+# recorded from the command line matches one recorded in the application.
+def testLabel(test) :
+    return "\x1f".join((os.path.basename(test.file), test.group or "", str(test.groupIndex), str(test.index), test.name or ""))
+
+def _pack(typecode, values) :
+    a = array(typecode, values)
+    if sys.byteorder == 'big' : a.byteswap()
+    return a.tobytes()
+
+def _unpack(typecode, data) :
+    a = array(typecode)
+    a.frombytes(data)
+    if sys.byteorder == 'big' : a.byteswap()
+    return a
+
+
+class BaselineEntry(object) :
+
+    def __init__(self, label, key, gids, positions, charinfo, passes = None) :
+        self.label = label
+        self.key = key
+        self.gids = gids            # array('H')
+        self.positions = positions  # array('i') of x, y, advance per glyph, in 1/64 units
+        self.charinfo = charinfo    # array('i') of before, after per glyph
+        self.passes = passes        # list of array('H') of the rules that fired, or None
+
+    def test(self) :
+        (fname, group, groupIndex, index, name) = self.label.split("\x1f")
+        return (fname, group, int(groupIndex), int(index), name)
+
+    def toBytes(self, withPasses) :
+        lab = self.label.encode('utf-8')
+        res = [recordStruct.pack(self.key, len(lab)), lab, struct.pack('<I', len(self.gids)),
+               _pack('H', self.gids), _pack('i', self.positions), _pack('i', self.charinfo)]
+        if withPasses :
+            passes = self.passes or []
+            res.append(struct.pack('<H', len(passes)))
+            for p in passes :
+                res.append(struct.pack('<H', len(p)))
+                res.append(_pack('H', p))
+        return b''.join(res)
+
+# end of class BaselineEntry
+
+
+# Make an entry from the output slots of a test and, optionally, its trace.
+def makeEntry(test, size, slots, trace = None) :
+    slots = slots or []
+    positions = array('i')
+    charinfo = array('i')
+    for s in slots :
+        positions.extend((int(round(s['origin'][0] * 64)), int(round(s['origin'][1] * 64)),
+                          int(round(s['advance'][0] * 64))))
+        charinfo.extend((s['charinfo']['before'], s['charinfo']['after']))
+    passes = None
+    if trace is not None :
+        passes = []
+        for p in trace[-1]['passes'] if trace else [] :
+            fired = array('H')
+            for r in p.get('rules', []) :
+                fired.extend(c['id'] for c in r['considered'] if not c['failed'])
+            passes.append(fired)
+    return BaselineEntry(testLabel(test), inputKey(test, size), array('H', [s['gid'] for s in slots]),
+                         positions, charinfo, passes)
+
+
+class BaselineWriter(object) :
+
+    def __init__(self, fname, fontKey, size, withPasses = False) :
+        self.withPasses = withPasses
+        self.file = open(fname, 'wb')
+        self.file.write(headerStruct.pack(magic, version, flagPasses if withPasses else 0, size,
+                                          fontKey.encode('ascii')))
+        self.compressor = zlib.compressobj(6)
+
+    def write(self, entry) :
+        self.file.write(self.compressor.compress(entry.toBytes(self.withPasses)))
+
+    def close(self) :
+        self.file.write(self.compressor.flush())
+        self.file.close()
+
+
+# Reads the entries of a baseline file in order, decompressing as it goes.
+class BaselineReader(object) :
+
+    def __init__(self, fname) :
+        self.fname = fname
+        with open(fname, 'rb') as f :
+            header = f.read(headerStruct.size)
+        if len(header) < headerStruct.size :
+            raise ValueError("%s is not a baseline file" % fname)
+        (m, v, flags, self.size, fontKey) = headerStruct.unpack(header)
+        if m != magic or v != version :
+            raise ValueError("%s is not a baseline file of a known version" % fname)
+        self.withPasses = bool(flags & flagPasses)
+        self.fontKey = fontKey.decode('ascii')
+
+    def __iter__(self) :
+        with open(self.fname, 'rb') as f :
+            f.seek(headerStruct.size)
+            decompressor = zlib.decompressobj()
+            buf = bytearray()
+            pos = 0
+            eof = False
+
+            def read(n) :
+                nonlocal buf, pos, eof
+                while len(buf) - pos < n and not eof :
+                    data = f.read(1 << 16)
+                    if data :
+                        data = decompressor.decompress(data)
+                    else :
+                        data = decompressor.flush()
+                        eof = True
+                    del buf[:pos]
+                    pos = 0
+                    buf.extend(data)
+                if len(buf) - pos < n :
+                    return None
+                res = bytes(buf[pos:pos + n])
+                pos += n
+                return res
+
+            while True :
+                head = read(recordStruct.size)
+                if head is None : return
+                (key, labLen) = recordStruct.unpack(head)
+                label = read(labLen).decode('utf-8')
+                (n,) = struct.unpack('<I', read(4))
+                gids = _unpack('H', read(2 * n))
+                positions = _unpack('i', read(12 * n))
+                charinfo = _unpack('i', read(8 * n))
+                passes = None
+                if self.withPasses :
+                    (np,) = struct.unpack('<H', read(2))
+                    passes = []
+                    for i in range(np) :
+                        (nr,) = struct.unpack('<H', read(2))
+                        passes.append(_unpack('H', read(2 * nr)))
+                yield BaselineEntry(label, key, gids, positions, charinfo, passes)
+
+# end of class BaselineReader
+
+
+# Shape the tests, yielding (test, entry) in order. Tests whose (label, input key) is in skip
+# are known to be unchanged and are not shaped; their entry is None.
+def shapeEntries(fontFileName, tests, size, withPasses = False, skip = None, workers = None) :
+    shaper = CorpusShaper(fontFileName, size, workers)
+    todo = [not skip or (testLabel(t), inputKey(t, size)) not in skip for t in tests]
+    jobs = (t.job() for (t, d) in zip(tests, todo) if d)
+    results = shaper.traces(jobs) if withPasses else shaper.shape(jobs)
+    try :
+        for (t, d) in zip(tests, todo) :
+            if not d :
+                yield (t, None)
+                continue
+            res = next(results)
+            if withPasses :
+                trace = res[1] if res else []
+                yield (t, makeEntry(t, size, trace[-1]['output'] if trace else [], trace))
+            else :
+                yield (t, makeEntry(t, size, res[1] if res else []))
+    finally :
+        results.close()
+        shaper.close()
+
+# progress, if given, is called with the number of tests done so far and returns True to
+# stop early; the functions then return None.
+def recordBaseline(fname, fontFileName, tests, size, withPasses = False, workers = None, progress = None) :
+    writer = BaselineWriter(fname, fontHash(fontFileName), size, withPasses)
+    stopped = False
+    try :
+        for (i, (t, entry)) in enumerate(shapeEntries(fontFileName, tests, size, withPasses, workers = workers)) :
+            writer.write(entry)
+            if progress and progress(i + 1) :
+                stopped = True
+                break
+    finally :
+        writer.close()
+    if stopped :
+        os.remove(fname)
+        return None
+    return len(tests)
+
+
+class Regression(object) :
+
+    def __init__(self, label, kind, score, detail = "") :
+        self.label = label
+        self.kind = kind        # 'changed', 'new' or 'missing'
+        self.score = score
+        self.detail = detail
+
+    def test(self) :
+        return BaselineEntry(self.label, None, None, None, None).test()
+
+# Compare a current entry with its baseline; return a Regression, or None if they match.
+def compareEntries(old, new) :
+    score = 0
+    details = []
+    if old.key != new.key :
+        details.append("test input changed")
+    if old.gids != new.gids :
+        ops = SequenceMatcher(None, old.gids.tolist(), new.gids.tolist(), autojunk = False).get_opcodes()
+        n = sum(max(i2 - i1, j2 - j1) for (tag, i1, i2, j1, j2) in ops if tag != 'equal')
+        score += 1000 * n
+        details.append("%d glyph%s changed" % (n, "" if n == 1 else "s"))
+    elif old.positions != new.positions :
+        d = max(abs(a - b) for (a, b) in zip(old.positions, new.positions)) / 64.
+        score += d
+        details.append("moved by up to %g" % d)
+    if old.passes is not None and new.passes is not None and old.passes != new.passes :
+        n = sum(1 for (a, b) in zip(old.passes, new.passes) if a != b) + abs(len(old.passes) - len(new.passes))
+        score += 10 * n
+        details.append("rules fired differently in %d pass%s" % (n, "" if n == 1 else "es"))
+    if old.gids == new.gids and old.positions == new.positions and old.charinfo != new.charinfo :
+        score += 1
+        details.append("character mapping changed")
+    if not score :
+        return None
+    return Regression(new.label, 'changed', score, ", ".join(details))
+
+# Compare the tests with a baseline, returning the differences, worst first. The baseline
+# is read as a stream alongside the results; only when the tests are in a different order
+# from when it was recorded are baseline entries held until they are needed.
+def diffBaseline(fname, fontFileName, tests, workers = None, progress = None) :
+    reader = BaselineReader(fname)
+    size = reader.size
+    skip = None
+    if reader.fontKey == fontHash(fontFileName) :
+        skip = set((e.label, e.key) for e in reader)
+    baseline = iter(reader)
+    pending = {}
+
+    def find(label) :
+        if label in pending :
+            return pending.pop(label)
+        for e in baseline :
+            if e.label == label :
+                return e
+            pending[e.label] = e
+        return None
+
+    res = []
+    entries = shapeEntries(fontFileName, tests, size, reader.withPasses, skip, workers)
+    for (i, (t, entry)) in enumerate(entries) :
+        if progress and progress(i + 1) :
+            entries.close()
+            return None
+        old = find(testLabel(t))
+        if entry is None :
+            continue        # same input, same font
+        if old is None :
+            res.append(Regression(entry.label, 'new', 0, "not in baseline"))
+        else :
+            r = compareEntries(old, entry)
+            if r : res.append(r)
+    for e in list(pending.values()) + list(baseline) :
+        res.append(Regression(e.label, 'missing', 0, "no longer in tests"))
+    res.sort(key = lambda r : -r.score)
+    return res
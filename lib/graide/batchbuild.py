@@ -0,0 +1,145 @@
+#    Copyright 2026, SIL International
+#    All rights reserved.
+#
+#    This library is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published
+#    by the Free Software Foundation; either version 2.1 of License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should also have received a copy of the GNU Lesser General Public
+#    License along with this library in the file named "LICENSE".
+#    If not, write to the Free Software Foundation, 51 Franklin Street,
+#    suite 500, Boston, MA 02110-1335, USA or visit their web page on the 
+#    internet at http://www.fsf.org/licenses/lgpl.html.
+
+
+# Build several Graide projects at once, without the user interface:
+#
+#       python -m graide.batchbuild [-j N] project.cfg ...
+#
+# Each project is built in its own process, with the paths in its configuration taken
+# relative to the directory of the .cfg file.
+
+import os, sys, time
+from tempfile import TemporaryFile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from configparser import RawConfigParser
+from argparse import ArgumentParser
+
+if __name__ == '__main__' and 'QT_API' not in os.environ :
+    os.environ['QT_API'] = 'pyside2'
+
+from graide import utils
+from graide.utils import buildGraphite, configval, configintval, gdlErrorFileLineRe, gdlErrorLineRe
+
+
+class BuildResult(object) :
+
+    def __init__(self, cfgFileName) :
+        self.project = cfgFileName
+        self.result = 1         # as from buildGraphite: 0 for success
+        self.time = 0.
+        self.errors = []        # error and warning lines from the compiler
+        self.output = ""        # anything else the compiler said
+
+
+# The font a makegdl project generates its GDL from, loaded as Graide itself would.
+def loadProjectFont(config, basedir, fontFileName) :
+    from graide.font import GraideFont
+    from graide.gdx import Gdx
+    font = GraideFont()
+    font.loadFont(fontFileName)
+    apFileName = configval(config, 'main', 'ap')
+    if apFileName and os.path.exists(os.path.join(basedir, apFileName)) :
+        font.loadAP(os.path.join(basedir, apFileName))
+    else :
+        font.loadEmptyGlyphs("batchbuild")
+    gdxFileName = os.path.splitext(fontFileName)[0] + '.gdx'
+    if os.path.exists(gdxFileName) :
+        Gdx().readfile(gdxFileName, font, configval(config, 'build', 'makegdlfile'), apFileName,
+                        ronly = configintval(config, 'build', 'apronly'))
+    return font
+
+def buildProject(cfgFileName) :
+    res = BuildResult(cfgFileName)
+    start = time.time()
+    try :
+        basedir = os.path.dirname(os.path.abspath(cfgFileName))
+        config = RawConfigParser()
+        config.read(cfgFileName)
+        fontFileName = os.path.join(basedir, configval(config, 'main', 'font') or "")
+        if not os.path.isfile(fontFileName) :
+            res.errors.append("No such font file: " + fontFileName)
+            return res
+        if utils.grcompiler is None :
+            utils.findgrcompiler()
+        font = loadProjectFont(config, basedir, fontFileName) if configintval(config, 'build', 'usemakegdl') else None
+        gdlErrFileName = os.path.join(os.path.dirname(fontFileName), 'gdlerr.txt')
+        with TemporaryFile(mode = "w+") as errfile :
+            res.result = buildGraphite(config, None, font, fontFileName, errfile, gdlErrFileName, basedir)
+            errfile.seek(0)
+            res.output = errfile.read()
+        if os.path.exists(gdlErrFileName) :
+            with open(gdlErrFileName) as f :
+                res.errors.extend(l.strip() for l in f if gdlErrorFileLineRe.match(l.strip()) or gdlErrorLineRe.match(l.strip()))
+    except Exception as err :
+        res.result = 1
+        res.errors.append("%s: %s" % (type(err).__name__, err))
+    finally :
+        res.time = time.time() - start
+    return res
+
+def buildProjectGroup(cfgFileNames) :
+    return [buildProject(c) for c in cfgFileNames]
+
+# Projects whose fonts are in the same directory share the compiler's error file,
+# so they are built one after the other.
+def projectGroups(cfgFileNames) :
+    groups = {}
+    for c in cfgFileNames :
+        config = RawConfigParser()
+        config.read(c)
+        fontFileName = os.path.join(os.path.dirname(os.path.abspath(c)), configval(config, 'main', 'font') or "")
+        groups.setdefault(os.path.normcase(os.path.dirname(fontFileName)), []).append(c)
+    return list(groups.values())
+
+# Build the given projects, yielding a BuildResult for each as it finishes.
+def buildProjects(cfgFileNames, workers = None) :
+    groups = projectGroups(cfgFileNames)
+    if workers == 1 or len(groups) < 2 :
+        for c in cfgFileNames :
+            yield buildProject(c)
+        return
+    with ProcessPoolExecutor(max_workers = workers) as pool :
+        for f in as_completed([pool.submit(buildProjectGroup, g) for g in groups]) :
+            for res in f.result() :
+                yield res
+
+def main(argv = None) :
+    p = ArgumentParser(description = "Build the fonts of several Graide projects")
+    p.add_argument("projects", nargs = "+", help = "Project configuration files")
+    p.add_argument("-j", "--jobs", type = int, help = "Number of projects to build at once (default: number of processors)")
+    p.add_argument("-v", "--verbose", action = "store_true", help = "Show warnings and compiler output")
+    args = p.parse_args(argv)
+
+    failed = 0
+    total = time.time()
+    for res in buildProjects(args.projects, args.jobs) :
+        print("%s: %s (%.2fs)" % (res.project, "failed" if res.result else "ok", res.time))
+        if res.result :
+            failed += 1
+        for l in res.errors :
+            if res.result or args.verbose or 'error' in l :
+                print("    " + l)
+        if args.verbose and res.output.strip() :
+            print("    " + res.output.strip().replace("\n", "\n    "))
+    print("%d of %d projects built in %.2fs" % (len(args.projects) - failed, len(args.projects), time.time() - total))
+    return 1 if failed else 0
+
+if __name__ == '__main__' :
+    sys.exit(main())
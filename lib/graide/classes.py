@@ -21,6 +21,7 @@
 from qtpy import QtCore, QtGui, QtWidgets
 from graide.utils import configintval
 from graide.layout import Layout
+from bisect import bisect_left
 import traceback
 
 class ClassMemberDialog(QtWidgets.QDialog) :
@@ -76,6 +77,122 @@ class ClassMemberDialog(QtWidgets.QDialog) :
 # end of class ClassMemberDialog
 
 
+# The model behind the Classes tab: one row per class, sorted by name, with the class name
+# and its members. The member lists are only formatted when a row is asked for, i.e. when it
+# is visible, and reloading the font only inserts and removes the rows of classes that have
+# come and gone.
+class ClassesModel(QtCore.QAbstractTableModel) :
+
+    classEdited = QtCore.Signal(str, str)
+
+    def __init__(self, ronly = False) :
+        super(ClassesModel, self).__init__()
+        self.ronly = ronly
+        self.font = None
+        self.names = []         # class names, sorted
+        self.texts = {}         # class name -> formatted member list, filled in as needed
+        self.highlights = set()
+
+    def rowCount(self, parent = QtCore.QModelIndex()) :
+        return 0 if parent.isValid() else len(self.names)
+
+    def columnCount(self, parent = QtCore.QModelIndex()) :
+        return 0 if parent.isValid() else 2
+
+    def classAt(self, row) :
+        return self.font.classes.get(self.names[row]) if self.font else None
+
+    def memberText(self, name) :
+        t = self.texts.get(name)
+        if t is None :
+            c = self.font.classes[name]
+            font = self.font
+            t = "  ".join(filter(None, (font[x].GDLName() if font[x] else "" for x in c.elements)))
+            self.texts[name] = t
+        return t
+
+    def data(self, index, role) :
+        if not index.isValid() : return None
+        name = self.names[index.row()]
+        c = self.font.classes.get(name)
+        if c is None : return None
+        if index.column() == 0 :
+            if role == QtCore.Qt.DisplayRole :
+                return name
+            elif role == QtCore.Qt.ToolTipRole :
+                t = ""
+                if c.generated : t += "Generated "
+                if c.editable : t += "Editable "
+                if c.fname : t += c.fname
+                return t
+            elif role == QtCore.Qt.BackgroundRole and name in self.highlights :
+                return Layout.activePassColour
+        elif role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole) :
+            return self.memberText(name)
+        return None
+
+    def flags(self, index) :
+        if not index.isValid() : return QtCore.Qt.NoItemFlags
+        if index.column() == 0 :
+            return QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled
+        c = self.classAt(index.row())
+        if c is not None and (c.generated or not c.editable) and c.fname :
+            return QtCore.Qt.NoItemFlags | QtCore.Qt.ItemIsEnabled
+        else :
+            return QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsEditable
+
+    def setData(self, index, value, role = QtCore.Qt.EditRole) :
+        if not index.isValid() or index.column() != 1 or role != QtCore.Qt.EditRole :
+            return False
+        self.classEdited.emit(self.names[index.row()], value)
+        return True
+
+    # Bring the rows up to date with the classes of the font, removing and inserting rows
+    # for classes that have gone or appeared rather than resetting the whole model, so the
+    # view keeps its place. The member lists are formatted again as rows are next shown,
+    # since a build can rename glyphs as well as change classes.
+    def setFont(self, font) :
+        self.font = font
+        self.texts = {}
+        self.highlights = set()
+        classes = font.classes if font else {}
+        if self.ronly :
+            for c in classes.values() : c.editable = False
+        i = 0
+        for name in sorted(classes.keys()) :
+            j = i
+            while j < len(self.names) and self.names[j] < name :
+                j += 1
+            if j > i :
+                self.beginRemoveRows(QtCore.QModelIndex(), i, j - 1)
+                del self.names[i:j]
+                self.endRemoveRows()
+            if i == len(self.names) or self.names[i] != name :
+                self.beginInsertRows(QtCore.QModelIndex(), i, i)
+                self.names.insert(i, name)
+                self.endInsertRows()
+            i += 1
+        if i < len(self.names) :
+            self.beginRemoveRows(QtCore.QModelIndex(), i, len(self.names) - 1)
+            del self.names[i:]
+            self.endRemoveRows()
+        if self.names :
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.names) - 1, 1))
+
+    def rowOfClass(self, name) :
+        i = bisect_left(self.names, name)
+        return i if i < len(self.names) and self.names[i] == name else -1
+
+    def highlight(self, name) :
+        row = self.rowOfClass(name)
+        if row >= 0 :
+            self.highlights.add(name)
+            self.dataChanged.emit(self.index(row, 0), self.index(row, 0))
+        return row
+
+# end of class ClassesModel
+
+
 # Classes tab widget
 class Classes(QtWidgets.QWidget) :
 
@@ -90,11 +207,14 @@ class Classes(QtWidgets.QWidget) :
         self.vb = QtWidgets.QVBoxLayout(self)
         self.vb.setContentsMargins(*Layout.buttonMargins)
         self.vb.setSpacing(Layout.buttonSpacing)
-        self.tab = QtWidgets.QTableWidget(self)
+        self.model = ClassesModel(self.ronly)
+        self.model.classEdited.connect(self.classEdited)
+        self.tab = QtWidgets.QTableView(self)
+        self.tab.setModel(self.model)
+        self.tab.setWordWrap(False)
         self.vb.addWidget(self.tab)
-        self.tab.setColumnCount(2)
-        self.tab.cellDoubleClicked.connect(self.doubleClicked)
-        self.tab.cellClicked.connect(self.clicked)
+        self.tab.doubleClicked.connect(self.doubleClicked)
+        self.tab.clicked.connect(self.clicked)
         self.tab.horizontalHeader().hide()
         self.tab.verticalHeader().hide()
         self.bbox = QtWidgets.QWidget(self)
@@ -124,7 +244,6 @@ class Classes(QtWidgets.QWidget) :
         self.fButton.clicked.connect(self.findSelectedClass)
         self.fButton.setToolTip('Find class selected in source code')
         self.hb.addWidget(self.fButton)
-        self.classCount = 0
         self.font = font
         if font :
             self.loadFont(font)
@@ -141,82 +260,55 @@ class Classes(QtWidgets.QWidget) :
     # Populate the Classes tab with the defined classes.
     def loadFont(self, font) :
         self.font = font
-        keys = sorted(font.classes.keys())
-        num = len(keys)
-        self.classCount = num
-        oldnum = self.tab.rowCount()
-        if num != oldnum :
-            self.tab.setRowCount(num)
-        for i in range(num) :
-            l = QtWidgets.QTableWidgetItem(keys[i])
-            l.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
-            c = font.classes[keys[i]]
-            v = map(lambda x: font[x].GDLName() if font[x] else "", c.elements)
-            vList = list(v)
-            if len(vList) :
-                m = QtWidgets.QTableWidgetItem("  ".join(filter(None, vList)))
-            else :
-                m = QtWidgets.QTableWidgetItem("")
-            t = ""
-            if self.ronly : c.editable = False
-            if c.generated : t += "Generated "
-            if c.editable : t += "Editable "
-            if c.fname : t += c.fname
-            l.setToolTip(t)
-            if (c.generated or not c.editable) and c.fname :
-                m.setFlags(QtCore.Qt.NoItemFlags | QtCore.Qt.ItemIsEnabled)
-            else :
-                m.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsEditable)
-            m.fileLoc = (c.fname, c.lineno, c.editable)
-            self.tab.setItem(i, 0, l)
-            self.tab.setItem(i, 1, m)
+        self.model.setFont(font)
 
     # end of loadFont
     
     
-    def doubleClicked(self, row, col) :
-        if col == 0 :
-            self.findSourceForClass(row)
-        elif col == 1 :
-            self.popupClassMembers(row)
+    def doubleClicked(self, index) :
+        if index.column() == 0 :
+            self.findSourceForClass(index.row())
+        elif index.column() == 1 :
+            self.popupClassMembers(index.row())
 
     
-    def clicked(self, row, cell) :
+    def clicked(self, index) :
         # FontView::classSelected - highlight glyphs in Font tab
-        self.classSelected.emit(self.tab.item(row, 0).text())
+        self.classSelected.emit(self.model.names[index.row()])
         
     
     def popupClassMembers(self, row) :
-        className = self.tab.item(row, 0).text()
-        memberText = self.tab.item(row, 1).text()
-        memberList = memberText.split(" ")
+        className = self.model.names[row]
+        memberList = self.model.memberText(className).split(" ")
         dialog = ClassMemberDialog(self, className, memberList)
         dialog.show()   # modeless
         
+
+    # The member list of a class was edited in place.
+    def classEdited(self, name, text) :
+        self.classUpdated.emit(name, text)
+        self.model.setFont(self.font)
     
     # Highlight the source code where the given class is defined in the code pane.
     def findSourceForClass(self, row) :
         #print("findSourceForClass")
-        c = self.tab.item(row, 1)
-        if not c.fileLoc[0] or c.fileLoc[2] :
-            #print(c.fileLoc[0], c.fileLoc[2])
+        name = self.model.names[row]
+        c = self.model.classAt(row)
+        if not c.fname or c.editable :
             d = QtWidgets.QDialog(self)
-            name = self.tab.item(row, 0).text()
             d.setWindowTitle(name)
             l = QtWidgets.QVBoxLayout(d)
-            edit = QtWidgets.QPlainTextEdit(self.tab.item(row, 1).text(), d)
+            edit = QtWidgets.QPlainTextEdit(self.model.memberText(name), d)
             l.addWidget(edit)
             o = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
             o.accepted.connect(d.accept)
             o.rejected.connect(d.reject)
             l.addWidget(o)
             if d.exec_() :
-                t = edit.toPlainText()
-                self.tab.item(row, 1).setText(t)
-                self.classUpdated.emit(name, t)
-        elif c.fileLoc[0] :
-            #print("send array", c.fileLoc[0], c.fileLoc[1])
-            self.app.selectLine(*c.fileLoc[:2])
+                self.classEdited(name, edit.toPlainText())
+        elif c.fname :
+            #print("send array", c.fname, c.lineno)
+            self.app.selectLine(c.fname, c.lineno)
             return True
 
     #end of findSourceForClass
@@ -230,42 +322,28 @@ class Classes(QtWidgets.QWidget) :
         (name, ok) = QtWidgets.QInputDialog.getText(self, 'Add Class', 'Class Name:')
         if name and ok :
             self.classUpdated.emit(name, "")
-            l = QtWidgets.QTableWidgetItem(name)
-            l.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
-            v = QtWidgets.QTableWidgetItem("")
-            v.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsEditable)
-            r = self.tab.rowCount()
-            self.tab.setRowCount(r + 1)
-            self.tab.setItem(r, 0, l)
-            self.tab.setItem(r, 1, v)
+            self.model.setFont(self.font)
+            row = self.model.rowOfClass(name)
+            if row >= 0 : self.tab.scrollTo(self.model.index(row, 0))
 
     
     def delCurrent(self) :
-        r = self.tab.currentRow()
+        r = self.tab.currentIndex().row()
         if r < 0 :
             return
-        name = self.tab.item(r, 0).text()
+        name = self.model.names[r]
         self.classUpdated.emit(name, None)
-        self.tab.removeRow(r)
+        self.model.setFont(self.font)
     
     
     # Scroll to the selected class and highlight it in the class pane.
     def findSelectedClass(self) :
         #print("findSelectedClass")
         className = self.app.tab_edit.selectedText
-        d = QtWidgets.QDialog(self)
-        rowMatched = -1
-        for row in range(0, self.classCount) :
-            edit = QtWidgets.QPlainTextEdit(self.tab.item(row, 0).text(), d)
-            cname = edit.toPlainText()
-            if cname == className :
-                rowMatched = row
-                break
+        rowMatched = self.model.highlight(className)
 
         if rowMatched > -1 :
-            item = self.tab.item(rowMatched, 0)
-            self.tab.scrollToItem(item)
-            item.setBackground(Layout.activePassColour)
+            self.tab.scrollTo(self.model.index(rowMatched, 0))
 
             if self.selClassName == className :  # second time clicked
                 self.findSourceForClass(rowMatched)
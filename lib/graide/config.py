@@ -304,7 +304,13 @@ class ConfigDialog(QtWidgets.QDialog) :
         uiGridLo.addWidget(QtWidgets.QLabel('Display Kerning Edges'), 7, 0)
         uiGridLo.addWidget(self.ui_kernedges, 7, 1)
 
-        uiGridLo.setRowStretch(8, 1)  # 8 = total number of rows used
+        self.ui_savejson = QtWidgets.QCheckBox()
+        self.ui_savejson.setChecked(configintval(config, 'ui', 'savejson'))
+        self.ui_savejson.setToolTip('Write the Graphite debug output of each run to graide_dbg_output.json')
+        uiGridLo.addWidget(QtWidgets.QLabel('Save Graphite Debug Output'), 8, 0)
+        uiGridLo.addWidget(self.ui_savejson, 8, 1)
+
+        uiGridLo.setRowStretch(9, 1)  # 9 = total number of rows used
         self.tb.addItem(self.ui, 'User Interface')
 
         self.resize(500, 400)
@@ -418,6 +424,7 @@ class ConfigDialog(QtWidgets.QDialog) :
         self.updateChanged(self.ui_sizes, config, 'ui', 'waterfall', "")
         self.cbChanged(self.ui_ent, config, 'ui', 'entities')
         self.cbChanged(self.ui_kernedges,  config, 'ui', 'kernedges')
+        self.cbChanged(self.ui_savejson, config, 'ui', 'savejson')
 
     # When OK is clicked on config dialog:
     def updateChanged(self, widget, config, section, option, defaultExt, fn = None) :
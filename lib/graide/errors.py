@@ -19,6 +19,7 @@
 
 from qtpy import QtCore, QtWidgets
 from graide.layout import Layout
+from graide.utils import gdlErrorFileLineRe, gdlErrorLineRe
 import os, re
 
 class Errors(QtWidgets.QListWidget) :
@@ -46,35 +47,47 @@ class Errors(QtWidgets.QListWidget) :
             return
         f = open(fname)
         for l in f.readlines() :
-            l = l.strip()
-            # Look for FILENAME(LINENUM) : error(ERRORNUM): ... eg
-            #       myfile.gdl(34) : error(103: unexpected token: )
-            m = re.match(r'^(.*?)\((\d+)\) : (error|warning)\((\d+)\): (.*)$', l)
-            if m :
-                # Specific error/warning with filename and line number:
-                if m.group(3) == 'error' :
-                    self.addError(l, m.group(1), int(m.group(2)) - 1)
-                elif m.group(3) == 'warning' :
-                    self.addWarning(l, m.group(1), int(m.group(2)) - 1)
-                continue
-            m = re.match(r'(error|warning)\((\d+)\): (.*)$', l)
-            if m :
-                # Line with "error" or 'warning", eg:
-                #       error(139): Parsing failed
-                if m.group(1) == 'error' :
-                    self.addError(l)
-                else :
-                    self.addWarning(l)
-            m = re.match(r'^Compilation', l)
-            if m :
-                # Other, eg,
-                #       Compilation failed - 5 errors, 0 warnings
-                self.addItem(l.strip())
-            # Ignore other lines, eg:
-            #       Table versions generated:
-            #         Silf:4.1
+            self.addGdlErrorLine(l)
         f.close()
 
+    # Add a line of compiler output, highlighted if it is an error or warning.
+    def addOutputLine(self, l) :
+        if not self.addGdlErrorLine(l) :
+            self.addItem(l.strip())
+
+    # Add a line in the format of the compiler's error file. Return whether it was one
+    # worth listing.
+    def addGdlErrorLine(self, l) :
+        l = l.strip()
+        # Look for FILENAME(LINENUM) : error(ERRORNUM): ... eg
+        #       myfile.gdl(34) : error(103: unexpected token: )
+        m = gdlErrorFileLineRe.match(l)
+        if m :
+            # Specific error/warning with filename and line number:
+            if m.group(3) == 'error' :
+                self.addError(l, m.group(1), int(m.group(2)) - 1)
+            elif m.group(3) == 'warning' :
+                self.addWarning(l, m.group(1), int(m.group(2)) - 1)
+            return True
+        m = gdlErrorLineRe.match(l)
+        if m :
+            # Line with "error" or 'warning", eg:
+            #       error(139): Parsing failed
+            if m.group(1) == 'error' :
+                self.addError(l)
+            else :
+                self.addWarning(l)
+            return True
+        if l.startswith('Compilation') :
+            # Other, eg,
+            #       Compilation failed - 5 errors, 0 warnings
+            self.addItem(l)
+            return True
+        # Ignore other lines, eg:
+        #       Table versions generated:
+        #         Silf:4.1
+        return False
+
     def addError(self, txt, srcfile = None, line = 0) :
         w = self.addItem(txt, srcfile, line)
         w.setBackground(Layout.errorColour)
@@ -331,6 +331,9 @@ class FileTabs(QtWidgets.QTabWidget):
         self.bBuild = QtWidgets.QToolButton(self.bbox)
         self.bBuild.setDefaultAction(self.aBuild)
         self.hbox.addWidget(self.bBuild)
+        self.bCancelBuild = QtWidgets.QToolButton(self.bbox)
+        self.bCancelBuild.setDefaultAction(self.aCancelBuild)
+        self.hbox.addWidget(self.bCancelBuild)
         self.bSave = QtWidgets.QToolButton(self.bbox)
         self.bSave.setDefaultAction(self.aSave)
         self.hbox.addWidget(self.bSave)
@@ -355,8 +358,15 @@ class FileTabs(QtWidgets.QTabWidget):
 
     def setActions(self, app) :
         self.aBuild = QtWidgets.QAction(QtGui.QIcon.fromTheme("run-build", QtGui.QIcon(":/images/run-build.png")), "&Build", app)
-        self.aBuild.setToolTip("Save files and force rebuild")
+        self.aBuild.setToolTip("Save files and rebuild if anything has changed")
         self.aBuild.triggered.connect(app.buildClicked)
+        self.aForceBuild = QtWidgets.QAction("&Force Rebuild", app)
+        self.aForceBuild.setToolTip("Save files and rebuild even if nothing has changed")
+        self.aForceBuild.triggered.connect(lambda : app.buildClicked(force = True))
+        self.aCancelBuild = QtWidgets.QAction(QtGui.QIcon.fromTheme("process-stop", QtGui.QIcon(":/images/window-close.png")), "&Cancel Build", app)
+        self.aCancelBuild.setToolTip("Stop the build that is running")
+        self.aCancelBuild.triggered.connect(app.cancelBuild)
+        self.aCancelBuild.setEnabled(False)
         self.aSave = QtWidgets.QAction(QtGui.QIcon.fromTheme('document-save', QtGui.QIcon(":/images/document-save.png")), "&Save File", app)
         self.aSave.setToolTip('Save all files')
         self.aSave.triggered.connect(self.writeIfModified)
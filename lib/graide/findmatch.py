@@ -18,10 +18,10 @@
 #    internet at http://www.fsf.org/licenses/lgpl.html.
 
 from __future__ import print_function
-import os, re
+import os, re, time
 from xml.etree import cElementTree as et
 from graide.utils import reportError
-from graide.rungraphite import makeFontAndFace
+from graide.rungraphite import CorpusShaper
 
 
 from qtpy import QtCore, QtGui, QtWidgets
@@ -75,47 +75,70 @@ class MatchListWidget(QtWidgets.QListWidget):
 # end of clas MatchListWidget
 
 
+# A glyph pattern compiled into a small automaton that runs directly over a sequence of
+# gids. Each item is a set of gids (None for ANY) with an optional ?, * or + modifier.
+# The search tracks the set of items that could come next, so it takes time proportional
+# to the length of the output times the number of items, however big the classes are.
+class GlyphPattern(object) :
+
+    def __init__(self) :
+        self.items = []     # list of (frozenset of gids or None, modifier)
+
+    def add(self, gids, mod = "") :
+        self.items.append((frozenset(gids) if gids is not None else None, mod))
+        self.closures = None
+
+    def __len__(self) :
+        return len(self.items)
+
+    # For each state, the states reachable from it without consuming a glyph: past any
+    # run of optional (? or *) items.
+    def _makeClosures(self) :
+        n = len(self.items)
+        self.closures = [None] * (n + 1)
+        self.closures[n] = (n,)
+        for i in range(n - 1, -1, -1) :
+            if self.items[i][1] in ("?", "*") :
+                self.closures[i] = (i,) + self.closures[i + 1]
+            else :
+                self.closures[i] = (i,)
+
+    # Return True if the pattern matches anywhere in the sequence of gids.
+    def search(self, gids) :
+        if self.closures is None : self._makeClosures()
+        items = self.items
+        closures = self.closures
+        accept = len(items)
+        if accept in closures[0] : return True    # everything is optional
+        states = set()
+        for gid in gids :
+            states.update(closures[0])    # a match may start at any glyph
+            nextStates = set()
+            for i in states :
+                if i == accept : continue
+                (members, mod) = items[i]
+                if members is None or gid in members :
+                    nextStates.update(closures[i + 1])
+                    if mod in ("*", "+") :
+                        nextStates.add(i)
+            if accept in nextStates : return True
+            states = nextStates
+        return False
+
+# end of class GlyphPattern
+
+
 class GlyphPatternMatcher() :
     
     def __init__(self, app, matcher) :
         self.app = app
         self.matcher = matcher
         self.pattern = ""
-    
-    # Create a reg-exp from the list of glyphs in the pattern JSON.
-    # TEMPORARY FOR DEBUGGING
-    def tempCreateRegExp(self, font, json, startI = 0, endI = 3) :
-        jsonOutput = json[0]["output"]
-        pattern = ""
-        tempCnt = 0
-        for g in jsonOutput :
-            if tempCnt < startI :
-                continue
-            if g["gid"] == 848 :
-                classData = font.classes['cDiacritics']
-                pattern += "("
-                sep = ""
-                for classGlyph in classData.elements :
-                    pattern += sep + "_" + str(classGlyph)
-                    sep = "|"
-                pattern += ")"
-            elif tempCnt == 1 :
-                pattern += self._singleGlyphPattern() # ANY
-            else :
-                pattern += "_" + str(g["gid"])
-                
-            tempCnt = tempCnt + 1
-            if tempCnt >= endI :
-                break
-               
-        self.pattern = pattern
-
-    # end of tempCreateRegExp
-
+        self.compiled = None    # GlyphPattern
     
     def setUpPattern(self, glyphPattern, font) :
-        regexpPattern = ""
-        glyphItems = glyphPattern.split(' ')
+        compiled = GlyphPattern()
+        glyphItems = glyphPattern.split()
                
         for item in glyphItems :
             
@@ -126,39 +149,27 @@ class GlyphPatternMatcher() :
             else :
                 itemMod = ""
                     
-            glyphNum = font.glyphWithGDLName(item)
-                    
             if item == "ANY" :
-                itemPattern = self._singleGlyphPattern()
+                compiled.add(None, itemMod)
+                continue
                 
-            elif glyphNum >= 0 :
-                itemPattern = "<" + str(glyphNum) + ">"
+            glyphNum = font.glyphWithGDLName(item)
+            if glyphNum >= 0 :
+                compiled.add((glyphNum,), itemMod)
                     
             elif item in font.classes :
-                classData = font.classes[item]
-                itemPattern = "("
-                sep = ""
-                for classGlyph in classData.elements :
-                    itemPattern += sep + "<" + str(classGlyph) + ">"
-                    sep = "|"
-                itemPattern += ")"
+                compiled.add(font.classes[item].elements, itemMod)
                 
             else :
                 self.pattern = ""
+                self.compiled = None
                 popUpError("ERROR: '" + item + "' is not a valid class or glyph name.")
 
                 return
-            
-            if itemMod != "" :
-                if itemPattern[0:1] != "(" :
-                    itemPattern = "(" + itemPattern + ")" + "?"
-                else :
-                    itemPattern = itemPattern + "?"
-
-            regexpPattern += itemPattern
         # end of for item loop
                 
-        self.pattern = regexpPattern
+        self.pattern = " ".join(glyphItems)
+        self.compiled = compiled
         
     # end of setUpPattern
     
@@ -175,10 +186,7 @@ class GlyphPatternMatcher() :
         
         print("Searching " + targetFile + " for '" + self.pattern + "'...")
         
-        cpat = re.compile(self.pattern)  # compiled pattern
-        
-        totalTests = self._countTests(targetFile)
-        showProgress = (totalTests > 25)
+        cpat = self.compiled
         
         # Read and parse the target file.
         try :
@@ -188,68 +196,71 @@ class GlyphPatternMatcher() :
             print("could not search " + targetFile) ####
             return matchResults
 
-        print("makeFontAndFace", fontFileName)
-        faceAndFont = makeFontAndFace(fontFileName, 12)
+        tests = []
+        for g in e.iterfind('testgroup') :
+            groupLabel = g.get('label')
+            for t in g.iterfind('test') :
+                r = t.get('rtl')
+                d = t.find('string')
+                if d is None : d = t.find('text')
+                tests.append((groupLabel, t.get('label'), True if r == 'True' else False,
+                              d.text if d is not None else "", t.find('comment') or "",
+                              t.get('feats') or "", t.get('lang') or ""))
+
+        totalTests = len(tests)
+        showProgress = (totalTests > 25)
         
         if showProgress :
             print("Total tests=",totalTests)
             progressDialog = QtWidgets.QProgressDialog("Searching...0 matches", "Cancel", 0, totalTests, self.matcher)
             progressDialog.setWindowModality(QtCore.Qt.WindowModal)
 
+        # Shape the tests in parallel; results come back in test order as they are ready.
+        shaper = CorpusShaper(fontFileName, 12)
+        jobs = [(test[3], {}, test[2], None, 100) for test in tests]
+        results = shaper.gids(jobs)
+
         cntTested = 0
         cntMatched = 0
         canceled = False
-        for g in e.iterfind('testgroup') :
-            groupLabel = g.get('label')
-            for t in g.iterfind('test') :
-                testLabel = t.get('label')
-                r = t.get('rtl')
-                testRtl = True if r == 'True' else False
-                d = t.find('string')
-                if d is None : d = t.find('text')
-                testString = d.text if d is not None else ""
-                testComment = t.find('comment') or ""
-                featDescrip = t.get('feats') or ""
-                langCode = t.get('lang') or ""
-                
-                jsonOutput = self.app.runGraphiteOverString(fontFileName, faceAndFont, testString, 12, testRtl, {}, {}, 100)
-                if jsonOutput != False :
-                    glyphOutput = self._dataFromGlyphs(jsonOutput)
-                    match = cpat.search(glyphOutput)
-                else :
-                    match = False
-                    
-                if match :
-                    key = "[" + groupLabel + "] " + testLabel
-                    
-                    if matchList == None :
-                        # Return a list of the results.
-                        matchResults.append((key, testString, testRtl, testComment, featDescrip, langCode))
-                    else :
-                        # Put a match right into the control.
-                        te = Test(text = testString, feats = featDescrip, lang = langCode, rtl = testRtl, name = key, comment = testComment)
-                        matchList.appendTest(te)
-                        matchResults = True
-                        cntMatched = cntMatched + 1
-                        if showProgress :
-                            progressDialog.setLabelText("Searching..." + str(cntMatched) + " matches")
-                ###else :
-                ###    print(testLabel + " did not match")
-                
-                cntTested = cntTested + 1
-                #if cntTested >= 1 : canceled = True
+        lastShown = 0
+        for (test, gids) in zip(tests, results) :
+            (groupLabel, testLabel, testRtl, testString, testComment, featDescrip, langCode) = test
+            if gids is not None :
+                match = cpat.search(gids)
+            else :
+                match = False
                 
-                if showProgress :
-                    if progressDialog.wasCanceled() :
-                        canceled = True
-                    progressDialog.setValue(cntTested)
-                    progressDialog.forceShow()
+            if match :
+                key = "[" + groupLabel + "] " + testLabel
                 
-                if canceled : break
-            # end of for t loop
+                if matchList == None :
+                    # Return a list of the results.
+                    matchResults.append((key, testString, testRtl, testComment, featDescrip, langCode))
+                else :
+                    # Put a match right into the control.
+                    te = Test(text = testString, feats = featDescrip, lang = langCode, rtl = testRtl, name = key, comment = testComment)
+                    matchList.appendTest(te)
+                    matchResults = True
+                    cntMatched = cntMatched + 1
+            
+            cntTested = cntTested + 1
+            
+            # Refreshing the dialog processes events, so don't do it for every test.
+            if showProgress and (time.time() - lastShown > 0.1 or cntTested == totalTests) :
+                lastShown = time.time()
+                if matchList != None :
+                    progressDialog.setLabelText("Searching..." + str(cntMatched) + " matches")
+                if progressDialog.wasCanceled() :
+                    canceled = True
+                progressDialog.setValue(cntTested)
+                progressDialog.forceShow()
             
             if canceled : break
-        # end of for g loop
+        # end of for test loop
+        
+        results.close()  # stops any shaping still pending after a cancel
+        shaper.close()
         
         if showProgress :
             progressDialog.hide() # to counteract forceShow()
@@ -261,33 +272,6 @@ class GlyphPatternMatcher() :
 
     # end of search
     
-    
-    # For progress indicator dialog:
-    def _countTests(self, targetFile) :
-        try :
-            e = et.parse(targetFile)
-        except Exception as err :
-            return 0
-
-        cnt = 0
-        for g in e.iterfind('testgroup') :
-            for t in g.iterfind('test') :
-                cnt = cnt + 1
-        return cnt
-    
-        
-    def _singleGlyphPattern(self) :
-        return "<[0-9]+>"
-            
-    # Generate a data string corresponding to the glyph output
-    # that can be matched against the reg-exp.
-    def _dataFromGlyphs(self, json) :
-        jsonOutput = json[0]["output"]
-        result = ""
-        for g in jsonOutput :
-            result += "<" + str(g["gid"]) + ">"
-        return result
-    
 # end of GlyphPatternMatcher class
 
 
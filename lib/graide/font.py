@@ -18,10 +18,53 @@
 #    internet at http://www.fsf.org/licenses/lgpl.html.
 
 import freetype
-from graide.glyph import GraideGlyph, GlyphItem
+from graide.glyph import GraideGlyph, GlyphItem, GlyphRasterCache
 from qtpy import QtCore
 from graide.makegdl.font import Font
-import re
+import re, math
+
+# The parts of a font that can be read without touching its glyph objects. Nothing here
+# involves Qt objects, so this can be done on a worker thread.
+class FontData(object) :
+    pass
+
+def readFontData(fontfile, size = 40, rasterLimit = 64 << 20) :
+    data = FontData()
+    data.size = size
+    data.fname = fontfile
+    face = freetype.Face(fontfile)
+    data.upem = face.units_per_EM
+    data.numGlyphs = face.num_glyphs
+    data.rasters = GlyphRasterCache(face, rasterLimit)
+    data.glyphItems = []
+    data.gnames = {} # full list of Postscript names
+
+    # Generate GlyphItems for all the glyphs in the font; they render themselves when needed.
+    for i in range(data.numGlyphs) :
+        g = GlyphItem(face, i, size, data.rasters)
+        data.gnames[g.name] = i
+        data.glyphItems.append(g)
+
+    # Size the area needed to display any glyph from the font-wide bounding box
+    # rather than by rendering every glyph.
+    scale = size / float(data.upem)
+    bbox = face.bbox
+    if bbox.yMax > bbox.yMin :
+        (xMin, yMin, xMax, yMax) = (bbox.xMin, bbox.yMin, bbox.xMax, bbox.yMax)
+    else :
+        (xMin, yMin, xMax, yMax) = (0, face.descender, face.max_advance_width, face.ascender)
+    data.top = int(math.ceil(yMax * scale))
+    bottom = int(math.ceil(-yMin * scale))
+    data.pixrect = (0, -data.top, int(math.ceil((xMax - xMin) * scale)), data.top + bottom)
+
+    data.cmap = {}
+    (uni, gid) = face.get_first_char()
+    while gid :
+        data.cmap[gid] = uni
+        (uni, gid) = face.get_next_char(uni, gid)
+
+    return data
+
 
 class GraideFont(Font) :
 
@@ -40,6 +83,9 @@ class GraideFont(Font) :
         self.fname = None # font filename, eg, "Hello.ttf"
         self.upem = None
         self.numGlyphs = 0
+        self.cmap = {}  # gid -> Unicode value
+        self.rasterLimit = 64 << 20    # memory budget for rendered glyphs, in bytes
+        self.rasters = None
 
     def isRead(self) : return self.isread
 
@@ -53,33 +99,30 @@ class GraideFont(Font) :
 
     def loadFont(self, fontfile, size = 40) :
         #print("GraideFont::loadFont",fontfile,size)
-        
-        self.glyphItems = []
-        self.pixrect = QtCore.QRect()
-        self.gnames = {}
-        self.top = 0
-        self.size = size
-        self.fname = fontfile
-        face = freetype.Face(fontfile)
-        self.upem = face.units_per_EM
-        self.numGlyphs = face.num_glyphs
-        
-        # Generate GlyphItems for all the glyphs in the font.
-        for i in range(self.numGlyphs) :
-            g = GlyphItem(face, i, size)
-            self.gnames[g.name] = i
-            self.glyphItems.append(g)
-            if g.pixmap :
-                grect = g.pixmap.rect()
-                grect.moveBottom(grect.height() - g.top)
-                self.pixrect = self.pixrect | grect
-            if g.top > self.top : self.top = g.top
+        self.setFontData(readFontData(fontfile, size, self.rasterLimit))
+
+    # Install the data read by readFontData, which may have been done on another thread.
+    def setFontData(self, data) :
+        self.glyphItems = data.glyphItems
+        self.gnames = data.gnames
+        self.cmap = data.cmap
+        self.size = data.size
+        self.fname = data.fname
+        self.upem = data.upem
+        self.numGlyphs = data.numGlyphs
+        self.rasters = data.rasters
+        self.top = data.top
+        self.pixrect = QtCore.QRect(*data.pixrect)
                 
         for (i, g) in enumerate(self.glyphs) :
             if i < len(self.glyphItems) and g :
                 g.setItem(self.glyphItems[i])
         self.isread = True
 
+    def setRasterLimit(self, limit) :
+        self.rasterLimit = limit
+        if self.rasters : self.rasters.setLimit(limit)
+
     def setGdxPath(self, gdxObject):
         #print("GraideFont::setGdxPath", self.numGlyphs, gdxObject.relPath)
         self.gdxPath = gdxObject.relPath
@@ -100,11 +143,8 @@ class GraideFont(Font) :
         self.initGlyphs(self.numGlyphs)
         for i in range(self.numGlyphs) :
             self.addGlyph(i, None, None, dbgContext+"--loadEmptyGlyphs")
-        face = freetype.Face(self.fname)
-        (uni, gid) = face.get_first_char()
-        while gid :
+        for (gid, uni) in self.cmap.items() :
             self[gid].uid = "%04X" % uni
-            (uni, gid) = face.get_next_char(uni, gid)
 
     def addGlyph(self, index, psName = None, gdlName = None, gdxPath = "", dbgContext = "unknown") :
         #if index % 100 == 0:  # print a sampling of glyphs
@@ -144,21 +184,17 @@ class GraideFont(Font) :
 
     def emunits(self) : return self.upem
         
+    # The name lookups use the indexes kept by Font as glyphs are added and renamed.
     def glyphWithGDLName(self, gdlName) :
-        for i in range(self.numGlyphs) :
-            if self[i].GDLName() == gdlName :
-                return i
-        return -1
+        gids = self.gdlGids.get(gdlName)
+        return min(gids) if gids else -1
         
     def glyphOrPseudoWithGDLName(self, gdlName) :
         gidResult = self.glyphWithGDLName(gdlName)
         if gidResult == -1 :
             # Look for a pseudo-glyph.
-            for i in range(self.numGlyphs, len(self.glyphs)) :
-                # use gdl attribute instead of GDLName() to handle pseudos
-                if self[i].gdl == gdlName :
-                    gidResult = i
-                    break
+            gids = self.pseudoGids.get(gdlName)
+            if gids : gidResult = min(gids)
         if gidResult == -1 :
             # Look for a single-glyph class.
             fontClass = self.classes[gdlName] if gdlName in self.classes else None
@@ -194,18 +230,13 @@ class GraideFont(Font) :
     
     # Return the real existing attachment point name, given the generic one.
     def actualAPName(self, genericName, mobile = False) :
-        for g in self.glyphs :
-            if not g : continue
-            for apName in g.anchors.keys() :
-                if mobile == True and apName == genericName + "M" :
-                    return genericName + "M"
-                elif not mobile and apName == genericName + "S" :
-                    return genericName + "S"
-            # Try again, looking for xxx and xxx_ pairs
-            for apName in g.anchors.keys() :
-                if mobile == True and apName == genericName + "_" :
-                    return genericName + "_"
-                elif not mobile and apName == genericName :
-                    return genericName
-        return ""                
+        # Prefer xxxS/xxxM, then try the xxx and xxx_ pairs
+        if mobile :
+            names = (genericName + "M", genericName + "_")
+        else :
+            names = (genericName + "S", genericName)
+        for apName in names :
+            if apName in self.apCounts :
+                return apName
+        return ""
                     
@@ -0,0 +1,63 @@
+#    Copyright 2026, SIL International
+#    All rights reserved.
+#
+#    This library is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published
+#    by the Free Software Foundation; either version 2.1 of License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should also have received a copy of the GNU Lesser General Public
+#    License along with this library in the file named "LICENSE".
+#    If not, write to the Free Software Foundation, 51 Franklin Street,
+#    suite 500, Boston, MA 02110-1335, USA or visit their web page on the 
+#    internet at http://www.fsf.org/licenses/lgpl.html.
+
+from qtpy import QtCore
+from graide.font import readFontData
+from graide.featureselector import make_FeaturesMap
+from graide.gdx import Gdx
+import os
+
+# Reads a font on a worker thread so that the window can come up while it loads.
+# The results are handed back in stages through signals, which Qt delivers on the
+# GUI thread; each signal carries the loader so that the receiver can ignore
+# results from a load that has since been superseded. The stages are the glyph
+# metrics and cmap, then the parsed GDX file (which the receiver puts into the font
+# along with the AP data), then the features. Glyph rasters are made as they are drawn.
+class FontLoader(QtCore.QThread) :
+
+    metricsLoaded = QtCore.Signal(object, object)     # loader, FontData
+    gdxLoaded = QtCore.Signal(object, object)         # loader, Gdx or None
+    featuresLoaded = QtCore.Signal(object, object)    # loader, features map or None
+
+    def __init__(self, fontname, size = 40, rasterLimit = 64 << 20, gdxfile = None, parent = None) :
+        super(FontLoader, self).__init__(parent)
+        self.fontname = fontname
+        self.gdxfile = gdxfile
+        self.size = size
+        self.rasterLimit = rasterLimit
+
+    def run(self) :
+        self.metricsLoaded.emit(self, readFontData(self.fontname, self.size, self.rasterLimit))
+        gdx = None
+        if self.gdxfile and os.path.exists(self.gdxfile) :
+            try :
+                gdx = Gdx()
+                gdx.load(self.gdxfile)
+            except Exception as err :
+                # The receiver reads it again itself, and reports the problem then.
+                gdx = None
+        self.gdxLoaded.emit(self, gdx)
+        try :
+            feats = make_FeaturesMap(self.fontname)
+        except :
+            # A font without Graphite?
+            feats = None
+        self.featuresLoaded.emit(self, feats)
+
+# end of class FontLoader
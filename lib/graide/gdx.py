@@ -19,7 +19,11 @@
 
 from xml.etree.cElementTree import iterparse
 from graide.makegdl.glyph import isMakeGDLSpecialClass
-import os, traceback
+from graide.makegdl.font import gdxGlyphData
+from array import array
+import os, traceback, hashlib, json
+
+cacheVersion = 2
 
 class Gdx(object) :
 
@@ -29,68 +33,245 @@ class Gdx(object) :
         self.passTypes = []
         self.collisionFix=[]
         self.flipDirs = []
-        self.keepelements = False
+        self.files = []         # source files referred to by rules, relative to the .gdx
+        self.fileIndex = {}
+        self.glyphs = []        # from gdxGlyphData
+        self.classes = []       # (name, gids, inFile, atLine)
+        self.prettyPrints = None    # per pass lists, read when first needed
 
-    def readfile(self, fname, font, autoGdlFile = None, apFileName = None, ronly = False) :
+    def readfile(self, fname, font, autoGdlFile = None, apFileName = None, ronly = False, useCache = True) :
         #print("Gdx::readFile")
+        self.load(fname, useCache)
+        self.install(font, autoGdlFile, apFileName, ronly)
+
+    # Read the file, or its cache. This does not touch the font, so it may be done on a
+    # worker thread, with install done afterwards on the GUI thread.
+    def load(self, fname, useCache = True) :
         self.relPath = os.path.relpath(os.path.dirname(fname) or ".") or ""
+        self.fname = fname
+        self.mtime = os.stat(fname).st_mtime
 
+        # What is read from the file is kept in a sidecar, so that an unchanged build
+        # can be reloaded without parsing the XML again. The sidecar is plain JSON, since
+        # it may come with a shared project and so cannot be trusted to unpickle.
+        cachefile = fname + 'cache'
+        key = gdxKey(fname) if useCache else None
+        if not key or not self.readCache(cachefile, key) :
+            self.parse(fname)
+            if key : self.writeCache(cachefile, key)
+
+    # Put what was read into the font.
+    def install(self, font, autoGdlFile = None, apFileName = None, ronly = False) :
         font.setGdxPath(self)
         
-        self.file = open(fname)
         if not apFileName :  # autoGdlFile??
             font.initGlyphs()
-        for (event, e) in iterparse(self.file, events=('start', 'end')) :
-            if event == 'start' :
-                if e.tag == 'pass' :
-                    #print "table=",e.get('table'),"index=",e.get('index'),"flipDir=",e.get('flipDir'),"collisionFix",e.get('collisionFix'),"autoKern",e.get('autoKern')
-                    self.passes.append([])
-                    self.passTypes.append(e.get('table'))
-                    self.collisionFix.append(int(e.get('collisionFix')) if e.get('collisionFix') else 0)
-                    # ignore autoKern for now
-                    self.flipDirs.append(int(e.get('flipDir')) if e.get('flipDir') else 0)
-                    
-                elif e.tag in ('rule', 'glyph', 'class') :
-                    self.keepelements = True
-            else :
-                if e.tag == "rule" :
-                    self.keepelements = False
-                    self.passes[-1].append(Rule(e, self.relPath))
-                if e.tag == 'glyph' :
-                    self.keepelements = False
-                    font.addGdxGlyph(e, apFileName, self.relPath)
+
+        for data in self.glyphs :
+            font.addGdxGlyphData(data, apFileName, self.relPath)
+        for data in self.classes :
+            self.addClass(data, font, autoGdlFile, ronly)
+        self.glyphs = []
+        self.classes = []
+
+    def parse(self, fname) :
+        # Elements are dropped from the tree as soon as they have been dealt with, except
+        # for the contents of <glyph> and <class>, which are needed when the element ends.
+        parents = []
+        keep = 0
+        slots = None
+        with open(fname) as f :
+            for (event, e) in iterparse(f, events=('start', 'end')) :
+                if event == 'start' :
+                    parents.append(e)
+                    if e.tag == 'pass' :
+                        #print "table=",e.get('table'),"index=",e.get('index'),"flipDir=",e.get('flipDir'),"collisionFix",e.get('collisionFix'),"autoKern",e.get('autoKern')
+                        self.passes.append(RuleList(self, len(self.passes)))
+                        self.passTypes.append(e.get('table'))
+                        self.collisionFix.append(int(e.get('collisionFix')) if e.get('collisionFix') else 0)
+                        # ignore autoKern for now
+                        self.flipDirs.append(int(e.get('flipDir')) if e.get('flipDir') else 0)
+                    elif e.tag == 'rule' :
+                        slots = []
+                    elif e.tag in ('glyph', 'class') :
+                        keep += 1
+                    continue
+
+                parents.pop()
+                if e.tag == 'rhsSlot' :
+                    if slots is not None : slots.append(int(e.get('slotIndex')))
+                elif e.tag == 'rule' :
+                    self.passes[-1].add(self.fileId(e.get('inFile')), int(e.get('atLine')) - 1, slots)
+                    slots = None
+                elif e.tag == 'glyph' :
+                    keep -= 1
+                    self.glyphs.append(gdxGlyphData(e))
                 elif e.tag == 'class' :
-                    self.keepelements = False
-                    n = e.get('name')
+                    keep -= 1
                     c = e.findall('member')
                     if len(c) :
-                        g = font[int(c[0].get('glyphid'))]
-                        fn = c[0].get('inFile')
-                        f = os.path.join(self.relPath, fn) if fn else None
-                        #print("class file name = ", f, "(", self.relPath, ")")
-                        l = int(c[0].get('atLine')) if f else 0
-                        if len(c) == 1 and g and g.GDLName() == n :
-                            pass
-                        elif not isMakeGDLSpecialClass(n) :
-                            # Note: subtract 1 from the line number because the GDX file 1-based,
-                            # the file editor is 0-based.
-                            if not autoGdlFile :
-                                font.addClass(n, map(lambda x: int(x.get('glyphid')), c), f, l - 1)
-                            elif n not in font.classes or ronly :
-                                font.addClass(n, map(lambda x: int(x.get('glyphid')), c), f, l - 1, generated = True)
-                if not self.keepelements :
+                        self.classes.append((e.get('name'), tuple(int(x.get('glyphid')) for x in c),
+                                             c[0].get('inFile'), c[0].get('atLine')))
+                if not keep :
+                    e.clear()
+                    if parents and len(parents[-1]) and parents[-1][-1] is e :
+                        del parents[-1][-1]
+
+    def addClass(self, data, font, autoGdlFile, ronly) :
+        (n, c, fn, l) = data
+        g = font[c[0]]
+        f = os.path.join(self.relPath, fn) if fn else None
+        #print("class file name = ", f, "(", self.relPath, ")")
+        l = int(l) if f else 0
+        if len(c) == 1 and g and g.GDLName() == n :
+            pass
+        elif not isMakeGDLSpecialClass(n) :
+            # Note: subtract 1 from the line number because the GDX file 1-based,
+            # the file editor is 0-based.
+            if not autoGdlFile :
+                font.addClass(n, c, f, l - 1)
+            elif n not in font.classes or ronly :
+                font.addClass(n, c, f, l - 1, generated = True)
+
+    def fileId(self, fname) :
+        res = self.fileIndex.get(fname)
+        if res is None :
+            res = len(self.files)
+            self.fileIndex[fname] = res
+            self.files.append(fname)
+        return res
+
+    def readCache(self, cachefile, key) :
+        try :
+            with open(cachefile, 'rb') as f :
+                data = json.loads(f.read().decode('utf-8'))
+            if data.get('version') != cacheVersion or data.get('key') != list(key) :
+                return False
+            passTypes = [str(t) for t in data['passTypes']]
+            collisionFix = [int(x) for x in data['collisionFix']]
+            flipDirs = [int(x) for x in data['flipDirs']]
+            files = list(data['files'])
+            glyphs = [(int(gid), n, u, fn, l, tuple(tuple(a) for a in attrs))
+                        for (gid, n, u, fn, l, attrs) in data['glyphs']]
+            classes = [(n, tuple(int(x) for x in c), fn, l) for (n, c, fn, l) in data['classes']]
+            passes = []
+            for (i, p) in enumerate(data['passes']) :
+                r = RuleList(self, i)
+                (r.fileIds, r.lines, r.slotStarts, r.slots) = (array('i', a) for a in p)
+                passes.append(r)
+        except Exception :
+            return False
+        self.passTypes = passTypes
+        self.collisionFix = collisionFix
+        self.flipDirs = flipDirs
+        self.files = files
+        self.fileIndex = dict((n, i) for (i, n) in enumerate(self.files))
+        self.glyphs = glyphs
+        self.classes = classes
+        self.passes = passes
+        return True
+
+    def writeCache(self, cachefile, key) :
+        data = {
+            'version' : cacheVersion,
+            'key' : list(key),
+            'passTypes' : self.passTypes,
+            'collisionFix' : self.collisionFix,
+            'flipDirs' : self.flipDirs,
+            'files' : self.files,
+            'glyphs' : self.glyphs,
+            'classes' : self.classes,
+            'passes' : [[a.tolist() for a in (r.fileIds, r.lines, r.slotStarts, r.slots)] for r in self.passes]
+        }
+        tmpfile = cachefile + '.tmp'
+        try :
+            with open(tmpfile, 'w') as f :
+                json.dump(data, f, separators = (',', ':'))
+            os.replace(tmpfile, cachefile)
+        except (IOError, OSError) as err :
+            print("WARNING: could not write GDX cache " + cachefile + ": " + str(err))
+
+    # The prettyPrint text of rules is only wanted for tooltips, so rather than holding it
+    # for every rule it is read from the file the first time one is asked for.
+    def prettyPrint(self, passindex, ruleindex) :
+        if self.prettyPrints is None :
+            self.prettyPrints = []
+            try :
+                if os.stat(self.fname).st_mtime == self.mtime :
+                    self.readPrettyPrints()
+            except (IOError, OSError) :
+                pass
+        if passindex < len(self.prettyPrints) and ruleindex < len(self.prettyPrints[passindex]) :
+            return self.prettyPrints[passindex][ruleindex]
+        return None
+
+    def readPrettyPrints(self) :
+        with open(self.fname) as f :
+            for (event, e) in iterparse(f, events=('start', 'end')) :
+                if event == 'start' :
+                    if e.tag == 'pass' :
+                        self.prettyPrints.append([])
+                elif e.tag == 'rule' :
+                    self.prettyPrints[-1].append(e.get('prettyPrint'))
                     e.clear()
+                elif e.tag in ('glyph', 'class', 'pass') :
+                    e.clear()
+
+# end of class Gdx
+
+
+# Identifies the contents of a .gdx file: its size and modification time, and a hash
+# in case the file was rewritten within the timestamp resolution.
+def gdxKey(fname) :
+    st = os.stat(fname)
+    h = hashlib.sha1()
+    with open(fname, 'rb') as f :
+        for chunk in iter(lambda : f.read(1 << 20), b'') :
+            h.update(chunk)
+    return (st.st_size, st.st_mtime, h.hexdigest())
+
+
+# The rules of one pass, held as flat arrays. Rule objects are only made when asked for.
+class RuleList(object) :
+
+    def __init__(self, gdx, passindex) :
+        self.gdx = gdx
+        self.passindex = passindex
+        self.fileIds = array('i')
+        self.lines = array('i')
+        self.slotStarts = array('i', [0])
+        self.slots = array('i')     # rhs slot offsets, relative to the first slot of each rule
+
+    def add(self, fileId, line, slots) :
+        self.fileIds.append(fileId)
+        self.lines.append(line)
+        if slots :
+            d = slots[0]
+            self.slots.extend(x - d for x in slots)
+        self.slotStarts.append(len(self.slots))
+
+    def __len__(self) :
+        return len(self.lines)
+
+    def __getitem__(self, i) :
+        if i < 0 : i += len(self.lines)
+        if i < 0 or i >= len(self.lines) : raise IndexError(i)
+        return Rule(self, i)
+
+    def __iter__(self) :
+        for i in range(len(self.lines)) :
+            yield Rule(self, i)
+
 
 class Rule(object) :
 
-    def __init__(self, e, relPath) :
-        #print("Rule::__init__", relPath)
-        self.srcfile = os.path.join(relPath, e.get('inFile'))
-        self.srcline = int(e.get('atLine')) - 1
-        self.pretty = e.get('prettyPrint')
-        slots = map(lambda x: int(x.get('slotIndex')), e.findall('rhsSlot'))
-        if any(slots) :
-            d = next(slots)
-            self.slots = map(lambda x : x - d, slots)
-        else :
-            self.slots = []
+    def __init__(self, rules, index) :
+        self.rules = rules
+        self.index = index
+        self.srcfile = os.path.join(rules.gdx.relPath, rules.gdx.files[rules.fileIds[index]])
+        self.srcline = rules.lines[index]
+        self.slots = list(rules.slots[rules.slotStarts[index]:rules.slotStarts[index + 1]])
+
+    @property
+    def pretty(self) :
+        return self.rules.gdx.prettyPrint(self.rules.passindex, self.index)
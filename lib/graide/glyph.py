@@ -21,6 +21,7 @@ from __future__ import print_function
 
 from qtpy import QtCore, QtGui
 import array, re, traceback
+from collections import OrderedDict
 from graide.attribview import Attribute, AttribModel
 from graide.utils import DataObj, popUpError
 from graide.makegdl.glyph import Glyph
@@ -48,23 +49,76 @@ def ftGlyph(face, gid, fill = 0) :
     return (pixmap, left, top)
 
 
+# Rendered glyphs for a whole font, keyed by (gid, pixel size, fill colour). Once the
+# pixmaps take up more than the limit (in bytes) the least recently used are dropped.
+class GlyphRasterCache(object) :
+
+    def __init__(self, face, limit = 64 << 20) :
+        self.face = face
+        self.limit = limit
+        self.entries = OrderedDict()    # key -> (pixmap, left, top)
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, gid, height, fill = 0) :
+        key = (gid, height, fill)
+        res = self.entries.get(key)
+        if res is not None :
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return res
+        self.misses += 1
+        self.face.set_char_size(height * 64)
+        res = ftGlyph(self.face, gid, fill)
+        self.entries[key] = res
+        self.total += self._size(res)
+        while self.total > self.limit and len(self.entries) > 1 :
+            (k, old) = self.entries.popitem(last = False)
+            self.total -= self._size(old)
+        return res
+
+    def _size(self, res) :
+        return res[0].width() * res[0].height() * 4 if res[0] else 0
+
+    def setLimit(self, limit) :
+        self.limit = limit
+        while self.total > self.limit and len(self.entries) > 1 :
+            (k, old) = self.entries.popitem(last = False)
+            self.total -= self._size(old)
+
+    def clear(self) :
+        self.entries.clear()
+        self.total = 0
+
+# end of class GlyphRasterCache
+
+
 # GlyphItems are stored in the GraideFont, in the glyphItems instance variable.
+# The pixmaps are rendered when first needed and held in the font's GlyphRasterCache.
 class GlyphItem(object) :
 
-    def __init__(self, face, gid, height = 40) :
-        face.set_char_size(height = int(height * 64))
-        (self.pixmap, self.left, self.top) = ftGlyph(face, gid)
+    def __init__(self, face, gid, height = 40, cache = None) :
         name = face.get_glyph_name(gid).decode('ascii')
         self.name = re.sub('[^A-Za-z0-9._]', '', name) # Postscript name
-        self.pixmaps = {height : (self.pixmap, self.left, self.top)}
-        self.face = face
+        self.cache = cache or GlyphRasterCache(face)
         self.gid = gid
+        self.height = height
+
+    @property
+    def pixmap(self) :
+        return self.pixmapAt(self.height)[0]
+
+    @property
+    def left(self) :
+        return self.pixmapAt(self.height)[1]
+
+    @property
+    def top(self) :
+        return self.pixmapAt(self.height)[2]
 
-    def pixmapAt(self, height) :
-        if height not in self.pixmaps :
-            self.face.set_char_size(height * 64)
-            self.pixmaps[height] = ftGlyph(self.face, self.gid)
-        return self.pixmaps[height]
+    def pixmapAt(self, height, fill = 0) :
+        return self.cache.get(self.gid, height, fill)
 
 
 class GraideGlyph(Glyph, DataObj, QtCore.QObject) :
@@ -20,6 +20,7 @@
 #    internet at http://www.fsf.org/licenses/lgpl.html.
 
 from graide.font import GraideFont
+from graide.fontloader import FontLoader
 from graide.run import Run
 from graide.attribview import AttribView
 from graide.fontview import FontView
@@ -27,9 +28,9 @@ from graide.runview import RunView
 from graide.passes import PassesView
 from graide.gdx import Gdx
 from graide.filetabs import FileTabs, FindInFilesResults
-from graide.utils import buildGraphite, configval, configintval, configvalString, registerErrorLog, findgrcompiler, as_entities, popUpError
+from graide.utils import GraphiteBuild, configval, configintval, configvalString, registerErrorLog, findgrcompiler, as_entities, popUpError
 from graide.layout import Layout
-from graide.rungraphite import runGraphite, makeFontAndFace, runGraphiteWithFontFace
+from graide.rungraphite import makeFontAndFace, runGraphiteWithLog, expandEntities
 from graide.featureselector import make_FeaturesMap, FeatureDialog, printFeaturesMap
 from graide.testlist import TestList
 from graide.test import Test
@@ -44,6 +45,11 @@ from graide.pyresources import qInitResources, qCleanupResources
 from graide.posedit import PosEdit, PosView
 from graide.tweaker import Tweaker, TweakView
 from graide.findmatch import GlyphPatternMatcher, MatchList, Matcher
+from graide.shapecache import ShapeCache, ShapeStore, shapeKey, fontHash
+from graide.runtests import readTests
+from graide.baseline import recordBaseline, diffBaseline
+from graide.regressions import RegressionDialog
+from graide.trace import Trace
 from qtpy import QtCore, QtGui, QtWidgets
 from graide.utils import ModelSuper, DataObj
 
@@ -76,6 +82,17 @@ class MainWindow(QtWidgets.QMainWindow) :
         self.font = GraideFont()
         self.fontFaces = {}
         self.fontFileName = None
+        self.fontKey = None
+        self.shapeCache = ShapeCache()  # results of runGraphiteOverString
+        self.shapeFlushTimer = QtCore.QTimer(self)  # writes new results to the store every so often
+        self.shapeFlushTimer.setInterval(5000)
+        self.shapeFlushTimer.timeout.connect(self.flushShapeStore)
+        self.shapeFlushTimer.start()
+        self.buildProcess = None    # grcompiler, while a build is running
+        self.buildOutput = []
+        self.buildCancelled = False
+        self.fontLoader = None
+        self.fontPending = set()    # parts of the font still being loaded in the background
         self.apname = None
         self.appTitle = "Graide v1.1.0"
         self.currConfigTab = 0
@@ -114,7 +131,9 @@ class MainWindow(QtWidgets.QMainWindow) :
                 popUpError("WARNING: No font file specified")
             elif not os.path.exists(fontname) :
                 popUpError("WARNING: Font file " + fontname + " does not exist.")
-            self.loadFont(fontname)
+            # A results file given on the command line is shown as the window is set up,
+            # so the font must be there by then.
+            self.loadFont(fontname, background = not jsonFile)
         elif self.cfgFileName is None or self.cfgFileName == "":
             # show() function will force them to create one.
             pass
@@ -124,7 +143,7 @@ class MainWindow(QtWidgets.QMainWindow) :
             if okCancel == False :
                 self.doExit()
             fontname = os.path.join(os.path.dirname(self.cfgFileName), config.get('main', 'font'))
-            self.loadFont(fontname)
+            self.loadFont(fontname, background = not jsonFile)
 
         if jsonFile :
             f = open(jsonFile)
@@ -251,7 +270,7 @@ class MainWindow(QtWidgets.QMainWindow) :
         return self.debugCnt
         
 
-    def loadFont(self, fontname) :
+    def loadFont(self, fontname, background = False) :
         
         if fontname == None : return
         if fontname == "" : return
@@ -265,6 +284,35 @@ class MainWindow(QtWidgets.QMainWindow) :
             fontsize = 40
         self.fontFileName = str(fontname)
         self.fontBuildTime = os.stat(fontname).st_ctime # modify time, for knowing when to rebuild
+        self.setFontKey()
+        if configintval(self.config, 'main', 'glyphcache') :
+            self.font.setRasterLimit(configintval(self.config, 'main', 'glyphcache') << 20)  # in MB
+
+        # basename = os.path.basename(fontname) # look in current directory. Why would you do that?
+        self.gdxfile = os.path.splitext(self.fontFileName)[0] + '.gdx'
+
+        if background :
+            # Read the font on a worker thread; the rest happens in fontMetricsLoaded
+            # and fontFeaturesLoaded as the pieces arrive.
+            if self.fontLoader :
+                self.fontLoader.wait()
+            self.fontPending = set(['glyphs', 'features'])
+            self.feats = {None: {}}
+            self.gdx = None
+            self.fontLoader = FontLoader(self.fontFileName, fontsize, self.font.rasterLimit, self.gdxfile, self)
+            self.fontLoader.metricsLoaded.connect(self.fontMetricsLoaded)
+            self.fontLoader.gdxLoaded.connect(self.fontGdxLoaded)
+            self.fontLoader.featuresLoaded.connect(self.fontFeaturesLoaded)
+            self.fontLoader.start()
+            return
+
+        # Any background load still going is superseded: let it finish reading the file,
+        # then drop it so that its signals are ignored.
+        if self.fontLoader :
+            self.fontLoader.wait()
+            self.fontLoader = None
+        self.fontPending = set()
+
         self.font.loadFont(self.fontFileName, fontsize)
 
         try:
@@ -275,30 +323,83 @@ class MainWindow(QtWidgets.QMainWindow) :
             print("WARNING: failure to load Graphite font features while loading font")
             self.feats = {None: {}}
 
-        # basename = os.path.basename(fontname) # look in current directory. Why would you do that?
-        self.gdxfile = os.path.splitext(self.fontFileName)[0] + '.gdx'
-        
         self.loadAP(os.path.join(os.path.dirname(self.cfgFileName), configvalString(self.config, 'main', 'ap')))
+        self.updateFontViews()
+
+    def updateFontViews(self) :
         if hasattr(self, 'tab_font') :
             if self.tab_font :
                 self.tab_font.resizeRowsToContents()
                 self.tab_font.resizeColumnsToContents()
             else :
-                self.tab_classes.classUpdated.disconnect(self.font.classUpdated)
                 i = self.tab_results.currentIndex()
                 self.tab_font = FontView(self.font)
                 self.tab_font.changeGlyph.connect(self.glyphSelected)
                 self.tab_results.insertTab(0, self.tab_font, "Font")
                 self.tab_results.setCurrentIndex(i)
-                self.tab_classes.classSelected.connect(self.font.classSelected)
+                self.tab_classes.classSelected.connect(self.tab_font.classSelected)
             self.tab_classes.loadFont(self.font)
 
         if hasattr(self, 'runView') :
             self.runView.gview.setFixedHeight(self.font.pixrect.height())
-            
+
+    def isFontLoading(self) :
+        return len(self.fontPending) > 0
+
+    # The glyphs of a font being loaded in the background have been read.
+    def fontMetricsLoaded(self, loader, data) :
+        if loader is not self.fontLoader : return  # superseded by a later load
+        self.font.setFontData(data)
+
+    # The GDX file has been parsed. The AP data and putting the GDX data into the font
+    # build the glyphs, which the views use, so that is done here on the GUI thread, on
+    # the next turn of the event loop so that the window can paint first.
+    def fontGdxLoaded(self, loader, gdx) :
+        if loader is not self.fontLoader : return
+        QtCore.QTimer.singleShot(0, lambda : self._fontGlyphsLoaded(loader, gdx))
+
+    def _fontGlyphsLoaded(self, loader, gdx) :
+        if loader is not self.fontLoader : return
+        self.loadAP(os.path.join(os.path.dirname(self.cfgFileName), configvalString(self.config, 'main', 'ap')), gdx)
+        self.updateFontViews()
+        self.fontPending.discard('glyphs')
+
+    def fontFeaturesLoaded(self, loader, feats) :
+        if loader is not self.fontLoader : return
+        if feats is None :
+            print("WARNING: failure to load Graphite font features while loading font")
+            feats = {None: {}}
+        self.feats = feats
+        self.fontPending.discard('features')
+
     # end of loadFont
 
-    def loadAP(self, apFileName):
+    # Shaping results are cached against a hash of the font, so that a new build
+    # invalidates them; the results persist in a store alongside the project file.
+    def setFontKey(self) :
+        self.fontKey = fontHash(self.fontFileName)
+        if self.cfgFileName :
+            storeName = os.path.splitext(os.path.abspath(self.cfgFileName))[0] + '.shapes'
+            if not self.shapeCache.store or self.shapeCache.store.fname != storeName :
+                if self.shapeCache.store : self.shapeCache.store.close()
+                self.shapeCache.clear()
+                try :
+                    self.shapeCache.store = ShapeStore(storeName)
+                except Exception as err :
+                    print("WARNING: could not open shaping results store " + storeName + ": " + str(err))
+                    self.shapeCache.store = None
+            if self.shapeCache.store :
+                self.shapeCache.store.setFont(self.fontKey)
+
+    def flushShapeStore(self) :
+        if self.shapeCache.store :
+            try :
+                self.shapeCache.store.flush()
+            except Exception as err :
+                print("WARNING: could not save shaping results: " + str(err))
+
+    # gdx, if given, is the GDX file already read by a FontLoader.
+    def loadAP(self, apFileName, gdx = None):
         #print("main - loadAP", apFileName)
         self.apname = apFileName
         if apFileName and os.path.exists(apFileName):
@@ -308,12 +409,17 @@ class MainWindow(QtWidgets.QMainWindow) :
                 print("WARNING: attachment point file '" + apFileName + "' not found")
             self.font.loadEmptyGlyphs("loadAP")
 
-        self.loadGdx()
+        self.loadGdx(gdx)
         self.loadClasses()
 
 
-    def loadGdx(self):
-        if os.path.exists(self.gdxfile) :
+    def loadGdx(self, gdx = None):
+        if gdx is not None :
+            self.gdx = gdx
+            self.gdx.install(self.font, configval(self.config, 'build', 'makegdlfile'),
+                                configval(self.config, 'main', 'ap'),
+                                ronly = configintval(self.config, 'build', 'apronly'))
+        elif os.path.exists(self.gdxfile) :
             self.gdx = Gdx()
             self.gdx.readfile(self.gdxfile, self.font, configval(self.config, 'build', 'makegdlfile'),
                                 configval(self.config, 'main', 'ap'),
@@ -372,6 +478,14 @@ class MainWindow(QtWidgets.QMainWindow) :
         self.aRunAdd.setToolTip("Add run to tests list under a new name")
         self.aRunAdd.triggered.connect(self.runAddClicked)
 
+        self.aRecordBaseline = QtWidgets.QAction("Record &Baseline ...", self)
+        self.aRecordBaseline.setToolTip("Record the output of all the tests as a baseline to compare later builds with")
+        self.aRecordBaseline.triggered.connect(self.recordBaselineClicked)
+
+        self.aDiffBaseline = QtWidgets.QAction("&Compare with Baseline ...", self)
+        self.aDiffBaseline.setToolTip("List the tests whose output differs from a baseline, worst first")
+        self.aDiffBaseline.triggered.connect(self.diffBaselineClicked)
+
         self.aSaveAP = QtWidgets.QAction(QtGui.QIcon.fromTheme('document-save', QtGui.QIcon(":/images/document-save.png")), "Save &APs", self)
         self.aSaveAP.triggered.connect(self.saveAP)
         self.aSaveAP.setToolTip('Save AP Database')
@@ -701,6 +815,8 @@ class MainWindow(QtWidgets.QMainWindow) :
         filemenu.addAction(self.tab_edit.aSave)
         filemenu.addSeparator()
         filemenu.addAction(self.tab_edit.aBuild)
+        filemenu.addAction(self.tab_edit.aForceBuild)
+        filemenu.addAction(self.tab_edit.aCancelBuild)
         filemenu.addAction('&Reset Names', self.resetNames)
         filemenu.addAction('Exit', self.doExit)
         ################3
@@ -726,6 +842,9 @@ class MainWindow(QtWidgets.QMainWindow) :
         testmenu.addAction(self.aRunFeats)
         testmenu.addAction(self.aRunAdd)
         testmenu.addSeparator()
+        testmenu.addAction(self.aRecordBaseline)
+        testmenu.addAction(self.aDiffBaseline)
+        testmenu.addSeparator()
         testmenu.addAction(self.tab_tests.aGAdd)
         testmenu.addAction(self.tab_tests.aGDel)
         testmenu.addSeparator()
@@ -777,6 +896,16 @@ Copyright 2012-2022 SIL International and M. Hosken""")
             self.rules.close()
         if self.isInitialized():
             self._saveProjectData()
+        if self.shapeCache.store :
+            self.shapeCache.store.close()
+        if self.fontLoader :
+            self.fontLoader.wait()
+        if self.buildProcess :
+            # Abandon the build and put back the font as it was.
+            self.buildProcess.finished.disconnect()
+            self.buildProcess.kill()
+            self.buildProcess.waitForFinished(-1)
+            self.build.finish(1)
         self.recentProjects.close()
         qCleanupResources()
 
@@ -901,31 +1030,108 @@ Copyright 2012-2022 SIL International and M. Hosken""")
         self.currWidth = test.width
         self.runView.clear()
 
-    def buildClicked(self) :
+    def buildClicked(self, wait = False, force = False) :
         #print("buildClicked")
 
+        if self.buildProcess :
+            return False    # already building
+        if self.isFontLoading() :
+            # The compiler would rewrite the font while it is still being read.
+            print("The font is still loading; try building again when it has loaded")
+            return False
+
         self.tab_edit.writeIfModified()
 
         #if self.tweaksfile :
         #    self.tab_tweak.writeXML(self.tweaksfile)
 
         self.tab_errors.clear()
-        errfile = NamedTemporaryFile(mode="w+")  ###, delete=False)   # delete=False for debugging
 
         self.fontFaces = {}
+        self.shapeCache.clear()
 
         outputPath = os.path.dirname(self.fontFileName)
         gdlErrFileName = outputPath + '/gdlerr.txt' if outputPath != "" else './gdlerr.txt'
 
-        res = buildGraphite(self.config, self, self.font, self.fontFileName, errfile, gdlErrFileName)
+        self.build = GraphiteBuild(self.config, self, self.font, self.fontFileName, gdlErrFileName, force = force)
+        res = self.build.prepare()
+        if res is not None :
+            self.buildFinished(res)
+            return True
+
+        # Run the compiler in the background, listing its output in the Errors tab as it
+        # comes, so that the rest of the application can be used in the meantime.
+        print("Compiling...")
+        self.buildOutput = []
+        self.buildPartial = ""
+        self.buildCancelled = False
+        self.buildProcess = QtCore.QProcess(self)
+        self.buildProcess.setProcessChannelMode(QtCore.QProcess.MergedChannels)
+        self.buildProcess.readyReadStandardOutput.connect(self.buildOutputReady)
+        self.buildProcess.finished.connect(self.buildProcessFinished)
+        self.buildProcess.errorOccurred.connect(self.buildProcessError)
+        self.tab_edit.aBuild.setEnabled(False)
+        self.tab_edit.aForceBuild.setEnabled(False)
+        self.tab_edit.aCancelBuild.setEnabled(True)
+        self.buildProcess.start(self.build.args[0], self.build.args[1:])
+        if wait :
+            self.buildProcess.waitForFinished(-1)
+        return True
 
+    def cancelBuild(self) :
+        if self.buildProcess :
+            self.buildCancelled = True
+            self.buildProcess.kill()
+
+    def buildOutputReady(self) :
+        text = self.buildPartial + bytes(self.buildProcess.readAllStandardOutput()).decode('utf-8', 'replace')
+        lines = text.split('\n')
+        self.buildPartial = lines.pop()
+        for l in lines :
+            self.addBuildOutput(l)
+
+    def addBuildOutput(self, l) :
+        self.buildOutput.append(l)
+        if l.strip() :
+            self.tab_errors.addOutputLine(l)
+            self.tab_errors.scrollToBottom()
+
+    def buildProcessFinished(self, exitCode, exitStatus) :
+        if self.buildPartial :
+            self.addBuildOutput(self.buildPartial)
+        if self.buildCancelled or exitStatus != QtCore.QProcess.NormalExit :
+            exitCode = exitCode or 1
+        self.buildProcessDone(exitCode)
+
+    def buildProcessError(self, error) :
+        # If the compiler could not be started at all, there will be no finished signal.
+        if error == QtCore.QProcess.FailedToStart :
+            print("error in running compiler")
+            self.buildProcessDone(1)
+
+    def buildProcessDone(self, res) :
+        self.buildProcess.deleteLater()
+        self.buildProcess = None
+        self.tab_edit.aBuild.setEnabled(True)
+        self.tab_edit.aForceBuild.setEnabled(True)
+        self.tab_edit.aCancelBuild.setEnabled(False)
+        self.buildFinished(self.build.finish(res))
+
+    def buildFinished(self, res) :
+        #print("compilation result =", res)
+        self.tab_errors.clear()
         if res :
             # Compilation failure
-            # Process temporary file generated by buildGraphite function.
-            errfile.seek(0)
-            for l in errfile.readlines() :
-                self.tab_errors.addItem(l.strip())
-                print(l.strip())  ####
+            # List the output of the compiler.
+            if self.buildCancelled :
+                self.tab_errors.addError("Build cancelled")
+            for l in self.buildOutput :
+                if l.strip() :
+                    self.tab_errors.addItem(l.strip())
+                    print(l.strip())  ####
+        self.buildOutput = []
+        self.buildCancelled = False
+        gdlErrFileName = self.build.gdlErrFileName
         # Process error list generated by Graphite compiler.
         self.tab_errors.addGdlErrors(gdlErrFileName)
 
@@ -940,6 +1146,8 @@ Copyright 2012-2022 SIL International and M. Hosken""")
 
         if res or self.tab_errors.bringToFront :
             self.tab_results.setCurrentWidget(self.tab_errors)
+        if not res :
+            self.setFontKey()
         if self.apname :
             self.loadAP(self.apname)
         else:
@@ -958,8 +1166,6 @@ Copyright 2012-2022 SIL International and M. Hosken""")
         # Get source-code files up-to-date.
         self.tab_edit.reloadModifiedFiles()
 
-        return True
-
     # end of buildClicked
 
     # Run Graphite over a test string.
@@ -974,12 +1180,14 @@ Copyright 2012-2022 SIL International and M. Hosken""")
 
         if not self.fontFileName :
             return
+        if self.isFontLoading() or self.buildProcess :
+            return
         if os.stat(self.fontFileName).st_ctime > self.fontBuildTime :
             self.loadFont(self.fontFileName)
 
         if not self.currFeats and self.currLang not in self.feats :
             if None not in self.feats :    # not a graphite font, try to build
-                self.buildClicked()
+                self.buildClicked(wait = True)
                 if self.currLang not in self.feats :
                     if None not in self.feats :     # build failed, do nothing.
                         self.tab_errors.addError("Can't run test on a non-Graphite font")
@@ -1008,12 +1216,6 @@ Copyright 2012-2022 SIL International and M. Hosken""")
             print("No Graphite result")
             self.json = [ {'passes' : [], 'output' : [] } ]
                 
-        ### Temp
-        #patternMatcher = GlyphPatternMatcher(self)
-        #patternMatcher.tempCreateRegExp(self.font, self.json, 0, 3)
-        #patternMatcher.search(self.fontFileName, self.config.get('main', 'testsfile'))
-        #####################
-        
         self.run = self.loadRunViewAndPasses(self, self.json)
         
     # end of runClicked
@@ -1046,22 +1248,16 @@ Copyright 2012-2022 SIL International and M. Hosken""")
     # end of loadRunViewAndPasses
     
     
+    # Returns the trace as a list of segments in the form of the Graphite JSON output.
     def runGraphiteOverString(self, fontFileName, faceAndFont, inputString, size, rtl, feats, lang, expand) :
         
         if inputString and inputString != "" :
-            text = re.sub(r'\\u([0-9A-Fa-f]{4})|\\U([0-9A-Fa-f]{5,8})', \
-                    lambda m: chr(int(m.group(1) or m.group(2), 16)), inputString)
+            text = expandEntities(inputString)
         else :
             text = None
         if not text :
             return False
             
-        tempFile = NamedTemporaryFile(mode="w+")
-        tempJsonFileName = tempFile.name
-        tempFile.close()
-        
-        #print(self.fontFaces)
-        
         if faceAndFont != None :
             self.fontFaces[size] = faceAndFont
             
@@ -1070,35 +1266,29 @@ Copyright 2012-2022 SIL International and M. Hosken""")
             # Cache these so we don't have to keep recreating them
             self.fontFaces[size] = faceAndFont
         
-        inputEntities = as_entities(text)
-        ###print "inputEntities=", inputEntities ###
-        
-        #if faceAndFont == None :
-        #    runGraphite(fontFileName, text, runfname, feats, rtl, lang, size, expand)
-        #else :
-        runGraphiteWithFontFace(self.fontFaces[size], text, tempJsonFileName,
+        # The font key changes whenever a build produces a different font.
+        key = shapeKey(self.fontKey, text, feats, lang, rtl, size, expand)
+        jsonResult = self.shapeCache.get(key)
+        if jsonResult is not None :
+            return jsonResult
+
+        # The debug output is captured in memory; only write it out if asked to.
+        (width, jsonText) = runGraphiteWithLog(self.fontFaces[size], text,
             feats, rtl, lang, size, expand)
         
-        #print(tempJsonFileName)     # uncomment to save JSON file
-        
-        tempJsonFile = open(tempJsonFileName)
-        jsonResult = json.load(tempJsonFile)
+        jsonResult = json.loads(jsonText)
         if isinstance(jsonResult, dict) : jsonResult = [jsonResult]
-        tempJsonFile.close()
-
-        # copy JSON to a debugger file in an accessible place
-        tempJsonFile = open(tempJsonFileName, "r")
-        stuff = tempJsonFile.read()
-        jsonDbgFilename = "./graide_dbg_output.json"
-        dbgJsonFile = open(jsonDbgFilename, "w")
-        dbgJsonFile.write("# Graphite JSON output for input string:\n#\n# ")
-        dbgJsonFile.write(inputEntities)
-        dbgJsonFile.write("\n\n")
-        dbgJsonFile.write(stuff)
-        dbgJsonFile.close()
-        
-        tempJsonFile.close()
-        os.unlink(tempJsonFileName)   # comment out to save JSON file
+        self.shapeCache.put(key, jsonResult, len(jsonText), jsonText)
+
+        if configintval(self.config, 'ui', 'savejson') :
+            # copy JSON to a debugger file in an accessible place
+            jsonDbgFilename = "./graide_dbg_output.json"
+            dbgJsonFile = open(jsonDbgFilename, "w")
+            dbgJsonFile.write("# Graphite JSON output for input string:\n#\n# ")
+            dbgJsonFile.write(as_entities(text))
+            dbgJsonFile.write("\n\n")
+            dbgJsonFile.write(jsonText)
+            dbgJsonFile.close()
         
         return jsonResult
     
@@ -1124,17 +1314,10 @@ Copyright 2012-2022 SIL International and M. Hosken""")
 
     # Return the output of the final pass.
     def _finalOutput(self, font, jsonall, gdx = None, rtl = False) :
-        if jsonall :
-            json = jsonall[0]
-        else :
-            json = {'passes' : [], 'output' : [] }  # empty output
-        num = len(json['passes']) + 1  # 0 = Init
-
+        trace = Trace(jsonall[0] if jsonall else None)
         glyphList = []
-        run = Run(self.font, rtl, configintval(self.config, 'ui', 'advanced'))
-        run.addSlots(json['output'])   # final output
-        for i, s in enumerate(run) :
-            g = font[s.gid] # g is a GraideGlyph
+        for gid in trace.finalGids() :
+            g = font[int(gid)] # g is a GraideGlyph
             if g :
                 t = g.GDLName() or g.psname
                 glyphList.append(t)
@@ -1149,6 +1332,58 @@ Copyright 2012-2022 SIL International and M. Hosken""")
         test = Test(text, self.currFeats or {}, self.currLang, self.runRtl.isChecked())
         self.tab_tests.addClicked(test)
 
+    # All the tests of the project, as saved; the current tests file is saved first.
+    def _baselineTests(self) :
+        self.tab_tests.saveTests()
+        tests = []
+        for f in self.tab_tests.testFiles :
+            try :
+                tests.extend(readTests(f))
+            except Exception as err :
+                print("WARNING: could not read tests file %s: %s" % (f, err))
+        return tests
+
+    def _baselineProgress(self, label, total) :
+        progressDialog = QtWidgets.QProgressDialog(label, "Cancel", 0, total, self)
+        progressDialog.setWindowModality(QtCore.Qt.WindowModal)
+        def progress(n) :
+            if n % 20 == 0 or n == total :
+                progressDialog.setValue(n)
+                QtWidgets.QApplication.processEvents()
+            return progressDialog.wasCanceled()
+        return (progressDialog, progress)
+
+    def recordBaselineClicked(self) :
+        if not self.fontFileName or self.isFontLoading() or self.buildProcess :
+            return
+        (fname, filt) = QtWidgets.QFileDialog.getSaveFileName(self, 'Record Baseline', '.', 'Baselines (*.grbl);;All files (*)')
+        if not fname : return
+        tests = self._baselineTests()
+        size = self.config.getint('main', 'size') if self.config.has_option('main', 'size') else 40
+        (progressDialog, progress) = self._baselineProgress("Recording baseline...", len(tests))
+        try :
+            recordBaseline(fname, self.fontFileName, tests, size, True, progress = progress)
+        except (IOError, OSError) as err :
+            popUpError("Could not write baseline %s: %s" % (fname, err))
+        progressDialog.close()
+
+    def diffBaselineClicked(self) :
+        if not self.fontFileName or self.isFontLoading() or self.buildProcess :
+            return
+        (fname, filt) = QtWidgets.QFileDialog.getOpenFileName(self, 'Compare with Baseline', '.', 'Baselines (*.grbl);;All files (*)')
+        if not fname : return
+        tests = self._baselineTests()
+        (progressDialog, progress) = self._baselineProgress("Comparing with baseline...", len(tests))
+        try :
+            regressions = diffBaseline(fname, self.fontFileName, tests, progress = progress)
+        except (IOError, OSError, ValueError) as err :
+            regressions = None
+            popUpError("Could not read baseline %s: %s" % (fname, err))
+        progressDialog.close()
+        if regressions is not None :
+            self.regressionDialog = RegressionDialog(self, regressions, self)
+            self.regressionDialog.show()
+
     def featuresClicked(self) :
         if self.font :
             fDialog = FeatureDialog(self)
@@ -1271,14 +1506,14 @@ Copyright 2012-2022 SIL International and M. Hosken""")
             if not os.path.exists(fontFileName) :
                 popUpError("ERROR: font file " + fontFileName + " does not exist.")
                 return False  # fail and try to open a different project
-            self.loadFont(fontFileName)
+            self.loadFont(fontFileName, background = True)
             
             if self.config.has_option('main', 'ap') :
                 apFileName = self.config.get('main', 'ap')
                 if not os.path.exists(apFileName) :
                     popUpError("WARNING: AP file " + apFileName + " does not exist.")
-                else :
-                    self.loadAP(apFileName)
+                elif not self.isFontLoading() :
+                    self.loadAP(apFileName)   # otherwise done once the font is read
             
         if self.config.has_option('main', 'testsfile') :
             testsFileName = self.config.get('main', 'testsfile')
@@ -23,6 +23,15 @@ from graide.makegdl.psnames import Name
 from xml.etree.cElementTree import ElementTree, parse, Element
 from builtins import str
 
+_autoPseudoRe = re.compile(r'^\*GC\d+\*$')
+_justifyRe = re.compile(r'^justify.(\d).([^.]+)')
+
+# The contents of a GDX <glyph> element as plain data, for Font.addGdxGlyphData:
+# (gid, className, usv, inFile, atLine, ((name, value, inFile, atLine), ...))
+def gdxGlyphData(e) :
+    return (int(e.get('glyphid')), e.get('className'), e.get('usv'), e.get('inFile'), e.get('atLine'),
+            tuple((a.get('name'), a.get('value'), a.get('inFile'), a.get('atLine')) for a in e.iterfind('glyphAttrValue')))
+
 # A collection of glyphs that have a given attachment point defined
 class PointClass(object) :
 
@@ -30,14 +39,19 @@ class PointClass(object) :
         self.name = name
         self.glyphs = []
         self.dias = []
+        # the same glyphs as sets, for membership tests; the lists keep the output order
+        self.glyphSet = set()
+        self.diaSet = set()
 #        self.isBase = False
 
     def addBaseGlyph(self, g) :
         self.glyphs.append(g)
+        self.glyphSet.add(g)
 #        if g.isBase : self.isBase = True
 
     def addDiaGlyph(self, g) :
         self.dias.append(g)
+        self.diaSet.add(g)
 
     def hasDias(self) :
         if len(self.dias) and len(self.glyphs) :
@@ -57,9 +71,17 @@ class PointClass(object) :
         if g.gid > maxGid : return False
             
         if isDia :
-            return g not in self.dias
+            return g not in self.diaSet
+        else :
+            return g not in self.diaSet and g not in self.glyphSet
+
+    # The glyphs of the list that are not in the class, in order.
+    def notInClass(self, glyphs, maxGid, isDia = False) :
+        if isDia :
+            excl = self.diaSet
         else :
-            return g not in self.dias and g not in self.glyphs
+            excl = self.diaSet | self.glyphSet
+        return [g for g in glyphs if g and g.gid <= maxGid and g not in excl]
 
 
 class FontClass(object) :
@@ -87,6 +109,8 @@ class Font(object) :
         self.subclasses = {}
         self.points = {}
         self.classes = {}
+        self.numRealGlyphs = 0
+        self.clearIndexes()
 
     def __len__(self) :
         return len(self.glyphs)
@@ -103,12 +127,59 @@ class Font(object) :
 
     def initGlyphs(self, nGlyphs) :
         #print "Font::initGlyphs",nGlyphs
+        # The old glyphs must no longer update the indexes, which are about to be cleared.
+        for g in self.glyphs :
+            if g and g.font is self :
+                g.font = None
         self.glyphs = [None] * nGlyphs
         self.numRealGlyphs = nGlyphs  # does not include pseudo-glyphs
         self.psnames = {}
         self.canons = {}
         self.gdls = {}
         self.classes = {}
+        self.clearIndexes()
+
+    # Indexes for looking glyphs up by name, kept up to date as glyphs are added and their
+    # names and APs change (the glyphs call back into the font): GDL name -> gids for real
+    # glyphs, gdl name -> gids for pseudo-glyphs, and AP name -> number of glyphs with it.
+    # The gids are held as sets since nothing stops two glyphs having the same name.
+    def clearIndexes(self) :
+        self.gdlGids = {}
+        self.pseudoGids = {}
+        self.apCounts = {}
+
+    def _nameIndex(self, g) :
+        if g.gid is None : return (None, None)
+        if g.gid < self.numRealGlyphs :
+            return (self.gdlGids, g.GDLName())
+        else :
+            return (self.pseudoGids, g.gdl)     # pseudo-glyphs are only known by their gdl name
+
+    def indexName(self, g) :
+        (index, name) = self._nameIndex(g)
+        if name :
+            index.setdefault(name, set()).add(g.gid)
+
+    def unindexName(self, g) :
+        (index, name) = self._nameIndex(g)
+        gids = index.get(name) if name else None
+        if gids :
+            gids.discard(g.gid)
+            if not gids : del index[name]
+
+    def anchorAdded(self, apName) :
+        self.apCounts[apName] = self.apCounts.get(apName, 0) + 1
+
+    def anchorRemoved(self, apName) :
+        n = self.apCounts.get(apName, 0) - 1
+        if n > 0 :
+            self.apCounts[apName] = n
+        else :
+            self.apCounts.pop(apName, None)
+
+    def unindexAnchors(self, g) :
+        for apName in g.anchors.keys() :
+            self.anchorRemoved(apName)
 
     def addGlyph(self, index = None, psName = None, gdlName = None, factory = Glyph) :
         #print "Font::addGlyph",index,psName,gdlName
@@ -118,20 +189,31 @@ class Font(object) :
             index = len(self.glyphs) 
             self.glyphs.append(g)
         elif index >= len(self.glyphs) :
-            self.glyphs.extend([None] * (len(self.glyphs) - index + 1))
+            self.glyphs.extend([None] * (index - len(self.glyphs) + 1))
+        old = self.glyphs[index]
+        if old and old.font is self :
+            self.unindexName(old)
+            self.unindexAnchors(old)
+            old.font = None
         self.glyphs[index] = g
+        g.font = self
+        self.indexName(g)
+        for apName in g.anchors.keys() :
+            self.anchorAdded(apName)
         return g
 
     def addGdxGlyph(self, e, apFileName, gdxPath) :
+        self.addGdxGlyphData(gdxGlyphData(e), apFileName, gdxPath)
+
+    def addGdxGlyphData(self, data, apFileName, gdxPath) :
         #print("addGdxGlyph", gdxPath)
         hasApFile = not not apFileName  # if there is an AP XML File, very little gets set here
                                         # (most of the glyph attrs get set directly from the XML file),
                                         # but we do need to set actualForPseudo, and also the glyph name
-        gid = int(e.get('glyphid'))
+        (gid, gdlName, u, inFile, atLine, attrs) = data
         
         g = self[gid]
-        gdlName = e.get('className')    # single-value "class", eg 'g_dollar'
-        if gdlName and re.match('^\*GC\d+\*$', gdlName) :  # autogenerated pseudo-glyph
+        if gdlName and _autoPseudoRe.match(gdlName) :  # autogenerated pseudo-glyph
             gdlName = None
         if not g :
             if gid > len(self.glyphs) :
@@ -147,47 +229,39 @@ class Font(object) :
             g.clear()
         if gdlName : self.setGDL(g, gdlName)
         storemirror = False
-        u = e.get('usv')
         if u and u.startswith('U+') : u = u[2:]
         if u : g.uid = u
             
-        inFile = e.get("inFile")
-        atLine = e.get("atLine")
         atLine = int(atLine)-1 if atLine else -1  # subtract 1 because GDX is 1-based but file editor is 0-based
         if inFile :
             relFile = os.path.join(gdxPath, inFile)
             g.addLineAndFile("gid", relFile, atLine)
             
-        for a in e.iterfind('glyphAttrValue') :
-            attrName = a.get('name')
-            
-            inFile = a.get("inFile")
-            atLine = a.get("atLine")
-                
-            m = re.match(r'^justify.(\d).([^.]+)', attrName)
+        for (attrName, value, inFile, atLine) in attrs :
+            m = _justifyRe.match(attrName) if attrName.startswith('justify') else None
             if m :
-                g.setJustify(int(m.group(1)), m.group(2), a.get('value'))
+                g.setJustify(int(m.group(1)), m.group(2), value)
             elif attrName == 'mirror.isEncoded' :
                 storemirror = True
             elif attrName == 'mirror.glyph' :
-                mirrorglyph = a.get('value')
+                mirrorglyph = value
             elif attrName.startswith('collision') :
-                g.setCollisionProp(attrName[10:], int(a.get('value')))
+                g.setCollisionProp(attrName[10:], int(value))
             elif attrName.startswith('sequence') :
-                g.setSequenceProp(attrName[9:], int(a.get('value')))
+                g.setSequenceProp(attrName[9:], int(value))
             elif attrName.startswith('octabox') :
-                g.setOctaboxProp(attrName[8:], a.get('value'))
+                g.setOctaboxProp(attrName[8:], value)
             elif g.builtInGlyphAttr(attrName) :
-                g.setGdlProperty(attrName, a.get('value'))
+                g.setGdlProperty(attrName, value)
             #elif hasApFile :
             #    pass 
             # AP file takes precedent for AP attributes so skip them
             elif attrName.endswith('.x') and not hasApFile : 
-                g.setAnchor(attrName[:-2], int(a.get('value')), None)
+                g.setAnchor(attrName[:-2], int(value), None)
             elif attrName.endswith('.y') and not hasApFile :
-                g.setAnchor(attrName[:-2], None, int(a.get('value')))
+                g.setAnchor(attrName[:-2], None, int(value))
             else :
-                g.setUserProperty(attrName, a.get('value'))
+                g.setUserProperty(attrName, value)
             
             if inFile :
                 atLine = int(atLine) - 1 if atLine else -1
@@ -348,12 +422,13 @@ class Font(object) :
         munits = self.emunits()
         fh.write('table(glyph) {MUnits = ' + str(munits) + '};\n')
         nglyphs = 0
+        lines = []  # written in one go; the glyph table can be large
         for g in self.glyphs :
             if not g or not g.psname : continue
             if g.psname == '.notdef' :
-                fh.write(g.GDLName() + ' = glyphid(0)')
+                line = g.GDLName() + ' = glyphid(0)'
             else :
-                fh.write(g.GDLName() + ' = postscript("' + g.psname + '")')
+                line = g.GDLName() + ' = postscript("' + g.psname + '")'
             outs = []
             if len(g.anchors) :
                 for a in g.anchors.keys() :
@@ -364,9 +439,10 @@ class Font(object) :
                     pass  # ignore this one
                 else :
                     outs.append("%s=%s" % (p, v))
-            if len(outs) : fh.write(" {" + "; ".join(outs) + "}")
-            fh.write(";\n")
+            if len(outs) : line += " {" + "; ".join(outs) + "}"
+            lines.append(line + ";\n")
             nglyphs += 1
+        fh.write("".join(lines))
         fh.write("\n")
         fh.write("\n/* Point Classes */\n")
         for p in self.points.values() :
@@ -374,8 +450,8 @@ class Font(object) :
             n = p.name + "Dia"
             self.outclass(fh, "c" + n, p.classGlyphs(True))
             self.outclass(fh, "cTakes" + n, p.classGlyphs(False))
-            self.outclass(fh, 'cn' + n, filter(lambda x : p.isNotInClass(x, self.numRealGlyphs, True), self.glyphs))
-            self.outclass(fh, 'cnTakes' + n, filter(lambda x : p.isNotInClass(x, self.numRealGlyphs, False), self.glyphs))
+            self.outclass(fh, 'cn' + n, p.notInClass(self.glyphs, self.numRealGlyphs, True))
+            self.outclass(fh, 'cnTakes' + n, p.notInClass(self.glyphs, self.numRealGlyphs, False))
         fh.write("\n/* Classes */\n")
         for (c, l) in self.classes.items() : # c = class name, l = class object
             if c not in self.subclasses and not l.generated :  # don't output the class to the AP file if it was autogenerated
@@ -417,24 +493,18 @@ pass(%d);
 
 
     def outclass(self, fh, name, glyphs) :
-        fh.write(name + " = (")
-        count = 1
-        sep = ""
+        names = []
         for g in glyphs :
             if not g : continue
-                
-                
             if isinstance(g, str) :
-                fh.write(sep + g)
+                names.append(g)
             else :
-                if g.GDLName() is None :
+                n = g.GDLName()
+                if n is None :
                     print("Can't output " + str(g.gid) + " to class " + name)
                 else :
-                    fh.write(sep + g.GDLName())
-            if count % 8 == 0 :
-                sep = ',\n         '
-            else :
-                sep = ', '
-            count += 1
-        fh.write(');\n\n')
+                    names.append(n)
+        # eight to a line
+        lines = [", ".join(names[i:i + 8]) for i in range(0, len(names), 8)]
+        fh.write(name + " = (" + ",\n         ".join(lines) + ');\n\n')
 
@@ -18,7 +18,7 @@
 #    internet at http://www.fsf.org/licenses/lgpl.html.
 
 import re, traceback
-from graide.makegdl.psnames import Name
+from graide.makegdl.psnames import parseName
 from xml.etree.cElementTree import SubElement
 
 # Debugging:
@@ -43,6 +43,8 @@ def ap_gr(txt) :
 
 class Glyph(object) :
 
+    font = None     # the Font this glyph belongs to, told of changes to the glyph's names and APs
+
     def __init__(self, name, gid = 0) :
         self.clear()
         self.setName(name)
@@ -52,6 +54,7 @@ class Glyph(object) :
         self.comment = ""
 
     def clear(self) :
+        if self.font : self.font.unindexAnchors(self)
         self.anchors = {}
         self.classes = set()
         self.gdlProperties = {}
@@ -62,18 +65,23 @@ class Glyph(object) :
         self.octaboxProps = {}
 
     def setName(self, name) :
+        if self.font : self.font.unindexName(self)
         self.psname = name
         self.name = next(self.parseNames())
+        if self.font : self.font.indexName(self)
 
     def setAnchor(self, name, x, y, t = None) :
         send = True
         if name in self.anchors :
             if x is None and y is None :
                 del self.anchors[name]
+                if self.font : self.font.anchorRemoved(name)
                 return True
             if x is None : x = self.anchors[name][0]
             if y is None : y = self.anchors[name][1]
             send = self.anchors[name] != (x, y)
+        elif self.font :
+            self.font.anchorAdded(name)
         self.anchors[name] = (x, y)
         return send
         # if not name.startswith("_") and t != 'basemark' :
@@ -91,8 +99,7 @@ class Glyph(object) :
     def parseNames(self) :
         if self.psname :
             for name in self.psname.split("/") :
-                res = Name(name)
-                yield res
+                yield parseName(name)
         else :
             yield None
 
@@ -105,7 +112,9 @@ class Glyph(object) :
             return None
 
     def setGDL(self, name) :
+        if self.font : self.font.unindexName(self)
         self.gdl = name
+        if self.font : self.font.indexName(self)
 
     def readAP(self, elem, font) :
         self.uid = elem.get('UID', None)
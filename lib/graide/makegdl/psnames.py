@@ -19,6 +19,7 @@
 
 import re
 import traceback  # Debug
+from functools import lru_cache
 from builtins import chr, str
 
 uniToPsnameMap = {
@@ -4350,6 +4351,24 @@ def parse(name) :
     res = []
     return res
 
+_hexDigits = frozenset("0123456789ABCDEFabcdef")
+_hex4Re = re.compile(r"[0-9A-Fa-f]{4}")
+# GDL names mark capitals with an underscore: A -> _a
+_capsToGDL = dict((ord(c), "_" + c.lower()) for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+def _isHex(txt) :
+    return all(c in _hexDigits for c in txt)
+
+# Names are parsed once and shared: parseName returns the same Name, with its canonical
+# and GDL names already worked out, every time it is given the same string. The results
+# must be treated as read-only. The cache is big enough for the names of a full font;
+# beyond that the least recently used names are dropped.
+@lru_cache(maxsize = 1 << 16)
+def parseName(name, finalcomp = False) :
+    res = Name(name, finalcomp)
+    res.GDL()
+    return res
+
 class Name(object) :
     def __init__(self, name = None, finalcomp = False) :
         self.psname = name
@@ -4367,15 +4386,13 @@ class Name(object) :
             if not base and mod : 
                 base = dot + mod
                 mod = None
-            if re.match(r"^uni[0-9A-Fa-f]{4}", base) :
-                self.components.extend((int(x, 16), None) for x in re.findall(r"[0-9A-Fa-f]{4}", base))
+            hexbase = base[1:] if base[:1] == 'u' else base
+            if base.startswith("uni") and len(base) >= 7 and _isHex(base[3:7]) :
+                self.components.extend((int(x, 16), None) for x in _hex4Re.findall(base))
                 if mod :
                     self.components[-1] = (self.components[-1][0], mod)
-            elif re.match(r"^u?[0-9A-Fa-f]{4,6}$", base) :
-                if base[0] == 'u' :
-                    self.components.append((int(base[1:], 16), mod))
-                else :
-                    self.components.append((int(base, 16), mod))
+            elif 4 <= len(hexbase) <= 6 and _isHex(hexbase) :
+                self.components.append((int(hexbase, 16), mod))
             elif base in aglToUniMap :
                 self.components.append((ord(aglToUniMap[base]), mod))
             elif len(self.components) :
@@ -4458,7 +4475,7 @@ class Name(object) :
                 return None
                 
             res = "g_" + self.psname.replace('.', '_')
-            self.GDLName = re.sub(r"([A-Z])", lambda x : "_" + x.group(1).lower(), res)
+            self.GDLName = res.translate(_capsToGDL)
             return self.GDLName
             
         for k in self.components :
@@ -4472,7 +4489,7 @@ class Name(object) :
                 pass
             elif n in uniToPsnameMap :
                 if not res : res = "g_"
-                res += re.sub("([A-Z])", lambda x : "_" + x.group(1).lower(), uniToPsnameMap[n])
+                res += uniToPsnameMap[n].translate(_capsToGDL)
             elif not res :
                 res = "g" + n.lower()
             else :
@@ -4516,3 +4533,19 @@ class Name(object) :
 
     def __str__(self) : return self.psname
 
+
+# Time parsing every name in the AGL, and the uniXXXX name of every code point that has
+# one, with and without the shared cache.
+if __name__ == '__main__' :
+    import timeit
+    names = [k for (k, v) in aglToUniMap.items() if len(v) == 1] + ["uni" + k for k in uniToPsnameMap]
+    names += [n + ".alt" for n in names]
+    def uncached() :
+        for n in names :
+            Name(n).GDL()
+    def cached() :
+        for n in names :
+            parseName(n).GDL()
+    for (label, fn) in (("uncached", uncached), ("cached", cached)) :
+        t = min(timeit.repeat(fn, number = 1, repeat = 5))
+        print("%-8s %d names: %.2fms, %.2fus/name" % (label, len(names), t * 1000, t * 1e6 / len(names)))
@@ -23,6 +23,7 @@ from graide.run import Run
 from graide.runview import RunView
 from graide.utils import ModelSuper, DataObj, configintval
 from graide.layout import Layout
+from graide.trace import Trace
 import traceback
 
 class PassesItem(QtWidgets.QTableWidgetItem) :
@@ -57,7 +58,7 @@ class PassesView(QtWidgets.QTableWidget) :
 
     @QtCore.Slot(int)
     def activateRow(self, row) :
-        self.rowActivated(row, self.runViews[row])
+        self.rowActivated.emit(row, self.runView(row), self)
 
     def __init__(self, parent = None, index = 0) :
         super(PassesView, self).__init__(parent)
@@ -68,7 +69,9 @@ class PassesView(QtWidgets.QTableWidget) :
         self.currsel = None
         self.passindex = index  # used for Rules tab
         self.connected = False
-        self.runViews = []
+        self.runViews = []      # RunView for each row, or None until the row is first shown
+        self.pendingRows = {}   # row -> (font, function making its Run, collision) for rows not yet shown
+        self.colWidths = (0, 0)
         self.selectedRow = -1
         self.rulesJson = []     # Rule JSON for each pass
         self.collFixJson = []   # collision-fix JSON for each pass
@@ -78,25 +81,17 @@ class PassesView(QtWidgets.QTableWidget) :
     def setPassIndex(self, index) :
         self.passindex = index
 
-    def addRun(self, font, run, label, num, tooltip = "", highlight = False, collision = False) :
-        if num >= len(self.runViews) :
-            v = RunView(font, run, self, collision = collision)
-            self.runViews.append(v)
-            self.setCellWidget(num, 1, v.gview)
-            self.setCellWidget(num, 2, v.tview)
+    # Rows are filled in lazily: setRow gives a row its label and a way to make its run, and
+    # the run and its RunView are only made when the row scrolls into view or is asked for.
+    def setRow(self, num, font, makeRun, label, tooltip = "", highlight = False, collision = False) :
+        l = self.item(num, 0)
+        if l is None :
             l = QtWidgets.QTableWidgetItem(label)
             l.setFlags(QtCore.Qt.ItemIsEnabled)
             self.setItem(num, 0, l)
-            try :
-                v.slotSelected.connect(self.changeSlot)
-                v.glyphSelected.connect(self.changeGlyph)
-            except :
-                print("Passes connection failed")
         else :
-            v = self.runViews[num]
-            v.loadRun(run, font)
-            l = self.item(num, 0)
-        if tooltip : l.setToolTip(tooltip)
+            l.setText(label)
+        l.setToolTip(tooltip)
         if highlight == "active" :
             l.setBackground(Layout.activePassColour)
         elif highlight == "semi-active" :
@@ -104,8 +99,65 @@ class PassesView(QtWidgets.QTableWidget) :
         else :
             l.setBackground(QtGui.QColor(255, 255, 255))
         l.highlight = highlight
+        self.pendingRows[num] = (font, makeRun, collision)
+
+    # Start a new set of rows, keeping the existing RunViews for reuse.
+    def resetRows(self, count) :
+        self.pendingRows = {}
+        self.colWidths = (0, 0)
+        if count != self.rowCount() :
+            self.setRowCount(count)
+        self.runViews = self.runViews[:count] + [None] * (count - len(self.runViews))
+
+    # Make the run and view of a row if that hasn't been done yet.
+    def materialize(self, num) :
+        if num not in self.pendingRows : return False
+        (font, makeRun, collision) = self.pendingRows.pop(num)
+        run = makeRun()
+        v = self.runViews[num]
+        if v is None :
+            v = RunView(font, run, self, collision = collision)
+            self.runViews[num] = v
+            self.setCellWidget(num, 1, v.gview)
+            self.setCellWidget(num, 2, v.tview)
+            try :
+                v.slotSelected.connect(self.changeSlot)
+                v.glyphSelected.connect(self.changeGlyph)
+            except :
+                print("Passes connection failed")
+        else :
+            v.loadRun(run, font)
+        if num == self.selectedRow :
+            v.gview.setBackgroundBrush(self.palette().highlight())
         self.verticalHeader().setDefaultSectionSize(v.gview.size().height())
-        return (v.gview.width(), v.tview.width())
+        self.colWidths = (max(self.colWidths[0], v.gview.width()), max(self.colWidths[1], v.tview.width()))
+        return True
+
+    def materializeVisible(self) :
+        if not self.pendingRows or not self.isVisible() : return
+        done = False
+        while True :
+            top = max(self.rowAt(0), 0)
+            bottom = self.rowAt(self.viewport().height() - 1)
+            if bottom < 0 : bottom = self.rowCount() - 1
+            todo = [j for j in range(top, bottom + 1) if j in self.pendingRows]
+            if not todo : break
+            for j in todo :
+                self.materialize(j)
+            done = True     # the rows may have changed height, so look again
+        if done :
+            self.finishLoad(*self.colWidths)
+
+    def showEvent(self, event) :
+        super(PassesView, self).showEvent(event)
+        self.materializeVisible()
+
+    def resizeEvent(self, event) :
+        super(PassesView, self).resizeEvent(event)
+        self.materializeVisible()
+
+    def scrolled(self, value) :
+        self.materializeVisible()
 
     def finishLoad(self, w, wt) :
         w += 10
@@ -116,6 +168,7 @@ class PassesView(QtWidgets.QTableWidget) :
         self.columnResized(2, 0, wt)
         if not self.connected :
             self.cellDoubleClicked.connect(self.doCellDoubleClicked)
+            self.verticalScrollBar().valueChanged.connect(self.scrolled)
             self.connected = True
 
     def loadResults(self, font, jsonall, gdx = None, rtl = False, fontIsRtl = False) :
@@ -128,7 +181,8 @@ class PassesView(QtWidgets.QTableWidget) :
             ###json = jsonall[0]
         else :
             json = {'passes' : [], 'output' : [] }  # empty output
-        num = len(json['passes']) + 1  # 0 = Init
+        self.trace = Trace(json)
+        num = self.trace.numStages()  # 0 = Init
         count = num
         
         runDir = "rtl" if rtl else "ltr"
@@ -167,25 +221,19 @@ class PassesView(QtWidgets.QTableWidget) :
 
         advancedView = configintval(self.app.config, 'ui', 'advanced')
 
-        if count != self.rowCount() :
-            if count < self.rowCount() : self.runViews = self.runViews[:count]
-            self.setRowCount(count)
-        w = 0
-        wt = 0
+        # Work out the labels and highlighting of all the rows in one pass over the trace;
+        # the runs themselves are only made as the rows are shown.
+        self.flipFlags = []
+        self.dirLabels = []
+        self.resetRows(count)
+        changed = self.trace.changedStages()
         for j in range(num) :
             # Process the output of pass J which = input to pass J+1;  the rules are listed with pass J-1.
             # Note for J = 0 there are no rules.
-            run = Run(font, rtl, advancedView)
             highlight = False
-            if j < num - 1 :
-                run.addSlots(json['passes'][j]['slots'])  # output of pass J
-                #passid = int(json['passes'][j]['id']) - 1
-            else :
-                run.addSlots(json['output'])   # final output
-                #passid = j
-
-            #print "*** in loadResults: pass",j,"***"
-            #run.printDebug()
+            tooltip = ""
+            slots = self.trace.stageSlots(j)  # output of pass J, or the final output
+            reverse = False
 
             if j == 0 :
                 pname = "Init"
@@ -206,9 +254,7 @@ class PassesView(QtWidgets.QTableWidget) :
                     slotDir = json['outputdir']
                     passDir = json['passes'][j-1]['passdir']  # where the rules come from 
                 #print j,"- slot dir=",slotDir, "; pass dir=",passDir
-                if slotDir != passDir :
-                    run.reverseDirection()
-                    #run.printDebug()
+                reverse = (slotDir != passDir)
 
                 flipFlag = False
                 dirLabel = ""
@@ -230,9 +276,12 @@ class PassesView(QtWidgets.QTableWidget) :
 
                 # Add rows for any collisions, if this is such a pass.
                 if 1 < j and j < num and gdx and gdx.passTypes[j-1] == "positioning":
-                    thisSlots = json['output'] if (j == num - 1) else json['passes'][j]['slots']
-                    if self.hasCollisionFixedSlot(json['passes'][j-1]['slots'], thisSlots) :
+                    (moved, deltas) = self.trace.collisionMoves(j)
+                    if len(moved) :
                         highlight = "semi-active"
+                        tooltip = self.collisionTip(font, self.trace.stage(j).gid[moved], deltas)
+                if not changed[j] and not tooltip :
+                    tooltip = "No change to the glyphs or their positions"
                 if 'collisions' in json['passes'][j-1] :
                     self.collFixJson.append(json['passes'][j-1]['collisions'])
                 else :
@@ -240,21 +289,30 @@ class PassesView(QtWidgets.QTableWidget) :
 
                 # if passid == -1, NEXT pass is bidi pass
 
-            (neww, newt) = self.addRun(font, run, pname, j, highlight = highlight)
-            w = max(w, neww)
-            wt = max(wt, newt)
+            def makeRun(slots = slots, reverse = reverse) :
+                run = Run(font, rtl, advancedView)
+                run.addSlots(slots)
+                if reverse :
+                    run.reverseDirection()
+                return run
+
+            self.setRow(j, font, makeRun, pname, tooltip = tooltip, highlight = highlight)
 
-        self.finishLoad(w, wt)  # set column widths, etc
+        self.materializeVisible()
 
     # end of loadResults
 
+    # Describe the slots moved by collision fixing, given their glyphs and how far each moved.
+    def collisionTip(self, font, gids, deltas, maxShown = 10) :
+        res = ["Collision fixing moved %d slot%s" % (len(gids), "" if len(gids) == 1 else "s")]
+        for gid, (dx, dy) in list(zip(gids, deltas))[:maxShown] :
+            g = font[int(gid)] if font else None
+            name = (g.GDLName() or g.psname) if g else str(gid)
+            res.append("%s: (%g, %g)" % (name, dx, dy))
+        if len(gids) > maxShown :
+            res.append("...")
+        return "\n".join(res)
 
-    def hasCollisionFixedSlot(self, prevSlots, thisSlots) :
-        for i, slotInfo in enumerate(thisSlots) :
-            prevInfo = prevSlots[i]
-            if 'collision' in slotInfo.keys() and slotInfo['collision']['offset'] != prevInfo['collision']['offset'] :
-                return True
-        return False
 
     # The user double-clicked on a pass. Load the view of it showing the rules matched.
     def loadRules(self, font, json, jsonCollisions, initRun, flipDirPrev, flipDirThis, gdx) :
@@ -292,15 +350,16 @@ class PassesView(QtWidgets.QTableWidget) :
                     #    nextRun = run0.copy()  # s
                     #    dontReFlip = False
                     #else :
-                    nextRun = self.runs[-1].copy()
+                    # The runs share the slots that a rule leaves alone, and only copy
+                    # those they change, including by highlighting them.
+                    nextRun = self.runs[-1].share()
 
                     #print "loadRules - ", len(self.runs)
                     #nextRun.printDebug()
 
                     # in the previous run, highlight the modified output glyphs, if any
                     if begprev != -1 :
-                        for slot in self.runs[-1][begprev:endprev] :
-                            slot.highlight(prevHighlight)
+                        self.runs[-1].highlightSlots(begprev, endprev, prevHighlight)
 
                     if cRule['failed'] :
                         lext = " (failed)"
@@ -322,17 +381,17 @@ class PassesView(QtWidgets.QTableWidget) :
                         (beg, end) = nextRun.replaceSlots(outputSlots,
                                 runInfo['output']['range']['start'], runInfo['output']['range']['end'])
                         lext = ""
-                        islot = beg
                         if rowInput != -1 :
-                            for slot in self.runs[rowInput][beg:end] :   # in a previous run, highlight the matched input glyphs
+                            inputRun = self.runs[rowInput]
+                            for islot in range(beg, min(end, len(inputRun))) :   # in a previous run, highlight the matched input glyphs
                                 if begprev <= islot and islot < endprev :
-                                    slot.highlight('inAndOut')     # both input and output
+                                    inputRun.ownSlot(islot).highlight('inAndOut')     # both input and output
                                 else :
-                                    slot.highlight('input')
-                                islot = islot + 1
+                                    inputRun.ownSlot(islot).highlight('input')
                                 
                         if not cRule['failed'] and 'postshift' in runInfo['output'] :
-                            for slot in self.runs[-1][end:] :
+                            for i in range(end, len(self.runs[-1])) :
+                                slot = self.runs[-1].ownSlot(i)
                                 slot.origin = (slot.drawPosX() + runInfo['output']['postshift'][0],
                                                slot.drawPosY() + runInfo['output']['postshift'][1])
                                                
@@ -358,8 +417,7 @@ class PassesView(QtWidgets.QTableWidget) :
 
             # highlight the output of the last run
             if begprev != -1 :
-                for slot in self.runs[-1][begprev:endprev] :
-                    slot.highlight(prevHighlight)
+                self.runs[-1].highlightSlots(begprev, endprev, prevHighlight)
         
         # end of if json is not None
         
@@ -367,18 +425,13 @@ class PassesView(QtWidgets.QTableWidget) :
         if hasCollisions :
             self.loadCollisionsAux(font, jsonCollisions, initRun, gdx)
 
-        w = 0
-        wt = 0
-        self.setRowCount(len(self.runs))
-        for j in range(len(self.runs)) :
-            (neww, newt) = self.addRun(font, self.runs[j], self.runs[j].label, j,
-                    tooltip = gdx.passes[self.passindex][self.runs[j].ruleindex].pretty
-                                    if gdx and self.runs[j].ruleindex >= 0 else "",
+        self.resetRows(len(self.runs))
+        for (j, run) in enumerate(self.runs) :
+            self.setRow(j, font, lambda run = run : run, run.label,
+                    tooltip = gdx.passes[self.passindex][run.ruleindex].pretty
+                                    if gdx and run.ruleindex >= 0 else "",
                     collision = hasCollisions)
-            w = max(w, neww)
-            wt = max(wt, newt)
-            
-        self.finishLoad(w, wt)
+        self.materializeVisible()
         
     # end of loadRules
     
@@ -395,18 +448,13 @@ class PassesView(QtWidgets.QTableWidget) :
         
         self.loadCollisionsAux(font, json, initRun, gdx)
         
-        w = 0
-        wt = 0
-        self.setRowCount(len(self.runs))
-        for j in range(len(self.runs)) :
-            (neww, newt) = self.addRun(font, self.runs[j], self.runs[j].label, j,
-                    tooltip = gdx.passes[self.passindex][self.runs[j].ruleindex].pretty
-                                    if gdx and self.runs[j].ruleindex >= 0 else "",
+        self.resetRows(len(self.runs))
+        for (j, run) in enumerate(self.runs) :
+            self.setRow(j, font, lambda run = run : run, run.label,
+                    tooltip = gdx.passes[self.passindex][run.ruleindex].pretty
+                                    if gdx and run.ruleindex >= 0 else "",
                     collision = True)
-            w = max(w, neww)
-            wt = max(wt, newt)
-            
-        self.finishLoad(w, wt)
+        self.materializeVisible()
 
     # end of loadCollisions
         
@@ -515,7 +563,7 @@ class PassesView(QtWidgets.QTableWidget) :
 
     def doCellDoubleClicked(self, row, col) :
         if col == 0 :
-            self.rowActivated.emit(row, self.runViews[row], self)
+            self.rowActivated.emit(row, self.runView(row), self)
  
     def selectRow(self, row) :
         if self.selectedRow >= 0 :
@@ -527,13 +575,13 @@ class PassesView(QtWidgets.QTableWidget) :
             else : 
                 it.setBackground(QtGui.QColor(255, 255, 255))
             w = self.cellWidget(self.selectedRow, 1)
-            w.setBackgroundBrush(QtGui.QColor(255, 255, 255))
+            if w : w.setBackgroundBrush(QtGui.QColor(255, 255, 255))
         self.selectedRow = row
         if self.selectedRow >= 0 :
             it = self.item(self.selectedRow, 0)
             if it : it.setBackground(self.palette().highlight())
             w = self.cellWidget(self.selectedRow, 1)
-            w.setBackgroundBrush(self.palette().highlight())
+            if w : w.setBackgroundBrush(self.palette().highlight())   # else done when the row is shown
 
 
     def updateScroll(self, scrollWhere) :
@@ -555,6 +603,8 @@ class PassesView(QtWidgets.QTableWidget) :
         return self.collFixJson[num]
         
     def runView(self, num) :
+        if self.materialize(num) :
+            self.finishLoad(*self.colWidths)
         return self.runViews[num]
         
     def flipDir(self, num) :
@@ -0,0 +1,65 @@
+#    Copyright 2026, SIL International
+#    All rights reserved.
+#
+#    This library is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published
+#    by the Free Software Foundation; either version 2.1 of License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should also have received a copy of the GNU Lesser General Public
+#    License along with this library in the file named "LICENSE".
+#    If not, write to the Free Software Foundation, 51 Franklin Street,
+#    suite 500, Boston, MA 02110-1335, USA or visit their web page on the 
+#    internet at http://www.fsf.org/licenses/lgpl.html.
+
+
+from qtpy import QtCore, QtGui, QtWidgets
+import os
+
+# Lists the differences from a baseline, worst first. Double clicking one selects the test
+# in the tests list and runs it, so that it can be examined in the passes view.
+class RegressionDialog(QtWidgets.QDialog) :
+
+    def __init__(self, app, regressions, parent = None) :
+        super(RegressionDialog, self).__init__(parent)
+        self.app = app
+        self.regressions = regressions
+        self.setWindowTitle("Differences from Baseline")
+        self.vbox = QtWidgets.QVBoxLayout(self)
+        self.label = QtWidgets.QLabel("%d tests differ from the baseline" % len(regressions), self)
+        self.vbox.addWidget(self.label)
+        self.tree = QtWidgets.QTreeWidget(self)
+        self.tree.setColumnCount(3)
+        self.tree.setHeaderLabels(["Score", "Test", "Change"])
+        self.tree.setRootIsDecorated(False)
+        self.tree.setUniformRowHeights(True)
+        items = []
+        for (i, r) in enumerate(regressions) :
+            (fname, group, groupIndex, index, name) = r.test()
+            score = "%g" % r.score if r.kind == 'changed' else r.kind
+            item = QtWidgets.QTreeWidgetItem([score, "%s: %s/%s" % (os.path.basename(fname), group, name), r.detail])
+            item.setData(0, QtCore.Qt.UserRole, i)
+            items.append(item)
+        self.tree.addTopLevelItems(items)
+        self.tree.resizeColumnToContents(0)
+        self.tree.resizeColumnToContents(1)
+        self.tree.itemDoubleClicked.connect(self.showRegression)
+        self.vbox.addWidget(self.tree)
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        self.vbox.addWidget(buttons)
+        self.resize(600, 400)
+
+    def showRegression(self, item, col) :
+        r = self.regressions[item.data(0, QtCore.Qt.UserRole)]
+        if r.kind == 'missing' : return
+        (fname, group, groupIndex, index, name) = r.test()
+        if self.app.tab_tests.showTest(fname, groupIndex, index) :
+            self.app.runClicked()
+
+# end of class RegressionDialog
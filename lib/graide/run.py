@@ -29,6 +29,7 @@ class Run(list) :
         self.rtl = rtl
         self.kernEdges = None
         self.advancedView = advancedView
+        self.owned = None   # for a run made by share(), which slots are this run's own
 
     def addSlots(self, runinfo, flipDir = False) :
         for slotinfo in runinfo :
@@ -76,6 +77,28 @@ class Run(list) :
             res.append(slot.copy())
         return res
 
+    # A new run holding the same slots as this one, for a sequence of runs that each differ
+    # a little from the one before. Neither run may change a slot in place without first
+    # taking its own copy with ownSlot.
+    def share(self) :
+        res = Run(self.font, self.rtl, self.advancedView)
+        res.extend(self)
+        res.owned = [False] * len(self)
+        self.owned = [False] * len(self)
+        return res
+
+    # Return slot i, first copying it if it is shared with another run.
+    def ownSlot(self, i) :
+        if self.owned is not None and not self.owned[i] :
+            self[i] = self[i].copy()
+            self[i].index = i
+            self.owned[i] = True
+        return self[i]
+
+    def highlightSlots(self, beg, end, type) :
+        for i in range(max(beg, 0), min(end, len(self))) :
+            self.ownSlot(i).highlight(type)
+
     def indexOfId(self, ident) :
         for (i, slot) in enumerate(self) :
             if slot.id == ident : return i
@@ -97,12 +120,22 @@ class Run(list) :
         res = []
         for slotinfo in runinfo :
             slot = Slot(slotinfo, advancedView = self.advancedView)
+            slot.index = ini + len(res)
             res.append(slot)
         self[ini:fin] = res
-        for (i, slot) in enumerate(self) :
-            slot.index = i
+        if self.owned is not None :
+            self.owned[ini:fin] = [True] * len(res)
+            # The slots after the new ones may be shared, so leave their indexes to be
+            # put right by fixIndex when one is looked at.
+        else :
+            for (i, slot) in enumerate(self) :
+                slot.index = i
         return (ini, fin)
 
+    # Make the index of slot i match its position in this run.
+    def fixIndex(self, i) :
+        self[i].index = i
+
     def modifySlotWithId(self, id, attrName, value) :
         for (i, s) in enumerate(self) :
             if s.id == id :
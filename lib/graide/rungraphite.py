@@ -17,7 +17,9 @@
 #    suite 500, Boston, MA 02110-1335, USA or visit their web page on the 
 #    internet at http://www.fsf.org/licenses/lgpl.html.
 
-import sys
+import sys, os, re, json, threading, atexit
+from tempfile import mkstemp
+from concurrent.futures import ThreadPoolExecutor
 from graphite2 import gr2, grversion
 
 def strtolong(txt) :
@@ -36,6 +38,12 @@ def strtolong(txt) :
     return res
 
 
+# Replace \uXXXX and \UXXXXX entities in a test string with the characters they stand for.
+def expandEntities(txt) :
+    return re.sub(r'\\u([0-9A-Fa-f]{4})|\\U([0-9A-Fa-f]{5,8})',
+                  lambda m: chr(int(m.group(1) or m.group(2), 16)), txt)
+
+
 def bytestostr(byteseq):
     if not isinstance(byteseq,str):
         res = byteseq.decode('utf-8')
@@ -111,10 +119,26 @@ def runGraphiteWithFontFace(faceAndFont, text, debugname, feats = {}, rtl = 0, l
         gr2.gr_start_logging(grface, debugname.encode())
     else :
         debugfile = open(debugname, "w+")
-        #print("open", debugname)
         fd = debugfile.fileno()
         gr2.graphite_start_logging(fd, 0xFF)
 
+    (seg, width) = _makeSeg(faceAndFont, text, feats, rtl, lang, expand)
+    
+    if major > 1 or minor > 1 :
+        gr2.gr_stop_logging(grface)
+    else:
+        gr2.graphite_stop_logging()
+        debugfile.close()
+
+    return width
+
+# end of runGraphiteWithFontFace
+
+
+# Shape the text and return the segment and its (possibly justified) width.
+def _makeSeg(faceAndFont, text, feats, rtl, lang, expand) :
+    (grface, grfont) = faceAndFont
+
     lang = strtolong(lang)
     grfeats = gr2.gr_face_featureval_for_lang(grface, lang)
     for f, v in feats.items() :
@@ -129,32 +153,208 @@ def runGraphiteWithFontFace(faceAndFont, text, debugname, feats = {}, rtl = 0, l
             print("Invalid feature settings")
 
         gr2.gr_fref_set_feature_value(fref, int(v), grfeats)
-       
-    if major > 1 or minor > 1 :
-        gr2.gr_start_logging(grface, debugname.encode())
-    else :
-        debugfile = open(debugname, "w+")
-        fd = debugfile.fileno()
-        gr2.graphite_start_logging(fd, 0xFF)
 
-    ###print "text=",text  ####
     text_utf8 = text.encode('utf_8', errors='surrogatepass')  # don't crash on surrogates, they print as boxes
-    ###print "utf8=",text_utf8  ####
     seg = gr2.gr_make_seg(grfont, grface, 0, grfeats, 1, text_utf8, len(text), rtl)
     width = gr2.gr_seg_advance_X(seg)
-    ###print("width=", width)
-    
+
     if expand != 100 :
         width = width * expand / 100
         width = gr2.gr_seg_justify(seg, gr2.gr_seg_first_slot(seg), grfont, width, 0, 0, 0)
-    
+
+    return (seg, width)
+
+# end of _makeSeg
+
+
+# Somewhere for graphite to write its JSON debug output. On Linux this is an anonymous
+# in-memory file that graphite opens through /proc; elsewhere it is a scratch file that
+# is created once and reused. Each thread gets its own, since the log is per segment.
+class TraceLog(object) :
+
+    def __init__(self) :
+        self.fd = None
+        self.scratch = False
+        if hasattr(os, 'memfd_create') and os.path.isdir('/proc/self/fd') :
+            try :
+                self.fd = os.memfd_create('graide-trace')
+                self.name = '/proc/self/fd/%d' % self.fd
+            except OSError :
+                self.fd = None
+        if self.fd is None :
+            (self.fd, self.name) = mkstemp(suffix = '.json', prefix = 'graide')
+            self.scratch = True
+            atexit.register(self.close)
+
+    def rewind(self) :
+        os.ftruncate(self.fd, 0)
+        os.lseek(self.fd, 0, os.SEEK_SET)
+
+    def read(self) :
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        chunks = []
+        while True :
+            data = os.read(self.fd, 1 << 16)
+            if not data : break
+            chunks.append(data)
+        return b"".join(chunks).decode('utf-8')
+
+    def close(self) :
+        if self.fd is not None :
+            os.close(self.fd)
+            self.fd = None
+            if self.scratch :
+                try :
+                    os.unlink(self.name)
+                except OSError :
+                    pass
+
+# end of class TraceLog
+
+
+_traceLogs = threading.local()
+
+def _traceLog() :
+    log = getattr(_traceLogs, 'log', None)
+    if log is None :
+        log = _traceLogs.log = TraceLog()
+    return log
+
+
+# Run Graphite with logging turned on and return the width and the raw JSON debug text.
+def runGraphiteWithLog(faceAndFont, text, feats = {}, rtl = 0, lang = None, size = 16, expand = 100) :
+    (grface, grfont) = faceAndFont
+    log = _traceLog()
+    log.rewind()
+
+    (major, minor, debug) = grversion()
+    if major > 1 or minor > 1 :
+        gr2.gr_start_logging(grface, log.name.encode())
+    else :
+        gr2.graphite_start_logging(log.fd, 0xFF)
+
+    (seg, width) = _makeSeg(faceAndFont, text, feats, rtl, lang, expand)
+
     if major > 1 or minor > 1 :
         gr2.gr_stop_logging(grface)
-    else:
+    else :
         gr2.graphite_stop_logging()
-        debugfile.close()
-        print("close", debugname)
 
-    return width
+    return (width, log.read())
 
-# end of runGraphiteWithFontFace
+# end of runGraphiteWithLog
+
+
+# Run Graphite and return the width and the pass-by-pass trace as Python objects,
+# in the same form as the JSON debug output: a list with one entry per segment.
+def runGraphiteWithTrace(faceAndFont, text, feats = {}, rtl = 0, lang = None, size = 16, expand = 100) :
+    (width, logText) = runGraphiteWithLog(faceAndFont, text, feats, rtl, lang, size, expand)
+    trace = json.loads(logText)
+    if isinstance(trace, dict) : trace = [trace]
+    return (width, trace)
+
+# end of runGraphiteWithTrace
+
+
+# Run Graphite without any logging and read the final output straight off the segment's
+# slots. The result is a list of slot dictionaries using the same keys as the 'output'
+# section of the JSON debug output, for callers that don't need the pass-by-pass trace.
+# There is no 'id': graphite's slot ids only appear in its debug output, and the position
+# of a slot in the list is no substitute for one when matching slots against a trace.
+def runGraphiteFast(faceAndFont, text, feats = {}, rtl = 0, lang = None, size = 16, expand = 100) :
+    (grface, grfont) = faceAndFont
+    (seg, width) = _makeSeg(faceAndFont, text, feats, rtl, lang, expand)
+
+    slots = []
+    slot = gr2.gr_seg_first_slot(seg)
+    while slot :
+        slots.append({
+            'gid' : gr2.gr_slot_gid(slot),
+            'origin' : [gr2.gr_slot_origin_X(slot), gr2.gr_slot_origin_Y(slot)],
+            'advance' : [gr2.gr_slot_advance_X(slot, grface, grfont), gr2.gr_slot_advance_Y(slot, grface, grfont)],
+            'charinfo' : {'before' : gr2.gr_slot_before(slot), 'after' : gr2.gr_slot_after(slot)}
+        })
+        slot = gr2.gr_slot_next_in_segment(slot)
+    gr2.gr_seg_destroy(seg)
+
+    return (width, slots)
+
+# end of runGraphiteFast
+
+
+# Shapes a whole corpus of strings on a pool of threads. The graphite binding drops the
+# GIL while it is in the library, so shaping scales across cores; each worker thread
+# opens its own face and font once and keeps them for the life of the shaper.
+class CorpusShaper(object) :
+
+    def __init__(self, fontname, size = 12, workers = None) :
+        self.fontname = fontname
+        self.size = size
+        self.workers = workers or os.cpu_count() or 1
+        self.local = threading.local()
+        self.faces = []
+        self.lock = threading.Lock()
+
+    def _faceAndFont(self) :
+        faceAndFont = getattr(self.local, 'faceAndFont', None)
+        if faceAndFont is None :
+            faceAndFont = self.local.faceAndFont = makeFontAndFace(self.fontname, self.size)
+            with self.lock :
+                self.faces.append(faceAndFont)
+        return faceAndFont
+
+    # job = (text, feats, rtl, lang, expand); returns (width, slots) as from runGraphiteFast
+    def _shape(self, job) :
+        (text, feats, rtl, lang, expand) = job
+        if not text : return None
+        return runGraphiteFast(self._faceAndFont(), expandEntities(text),
+                               feats or {}, rtl, lang, self.size, expand)
+
+    # job = (text, feats, rtl, lang, expand); returns (width, trace) as from runGraphiteWithTrace
+    def _trace(self, job) :
+        (text, feats, rtl, lang, expand) = job
+        if not text : return None
+        return runGraphiteWithTrace(self._faceAndFont(), expandEntities(text),
+                                    feats or {}, rtl, lang, self.size, expand)
+
+    # job = (text, feats, rtl, lang, expand); returns the list of output gids
+    def _shapeGids(self, job) :
+        res = self._shape(job)
+        if res is None : return None
+        return [s['gid'] for s in res[1]]
+
+    # Yield the output gids for each job, in the order of the jobs, as soon as each is
+    # available. Closing the generator early cancels any work not yet started.
+    def gids(self, jobs) :
+        return self._map(self._shapeGids, jobs)
+
+    # As gids, but yield (width, slots) for each job, or None for an empty string.
+    def shape(self, jobs) :
+        return self._map(self._shape, jobs)
+
+    # As shape, but yield (width, trace) with the full pass-by-pass trace.
+    def traces(self, jobs) :
+        return self._map(self._trace, jobs)
+
+    def _map(self, fn, jobs) :
+        if self.workers == 1 :
+            for job in jobs :
+                yield fn(job)
+            return
+        pool = ThreadPoolExecutor(max_workers = self.workers)
+        results = pool.map(fn, jobs)
+        try :
+            for res in results :
+                yield res
+        finally :
+            results.close()
+            pool.shutdown(wait = True)
+
+    def close(self) :
+        with self.lock :
+            for (grface, grfont) in self.faces :
+                gr2.gr_font_destroy(grfont)
+                gr2.gr_face_destroy(grface)
+            self.faces = []
+
+# end of class CorpusShaper
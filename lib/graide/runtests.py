@@ -0,0 +1,205 @@
+#    Copyright 2026, SIL International
+#    All rights reserved.
+#
+#    This library is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published
+#    by the Free Software Foundation; either version 2.1 of License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should also have received a copy of the GNU Lesser General Public
+#    License along with this library in the file named "LICENSE".
+#    If not, write to the Free Software Foundation, 51 Franklin Street,
+#    suite 500, Boston, MA 02110-1335, USA or visit their web page on the 
+#    internet at http://www.fsf.org/licenses/lgpl.html.
+
+
+# Shape the tests of a Graide project without the user interface, and write the output
+# glyphs and their positions to a JSON or CSV file:
+#
+#       python -m graide.runtests [-t tests.xml ...] [-o results.json] project.cfg
+#
+# or record them as a baseline, and later compare a new build of the font against it:
+#
+#       python -m graide.runtests --record golden.grbl [--passes] project.cfg
+#       python -m graide.runtests --diff golden.grbl project.cfg
+#
+# This deliberately uses nothing from Qt, so that it can run where there is no display.
+
+import os, sys, json, csv, time
+from xml.etree import cElementTree as et
+from configparser import RawConfigParser
+from argparse import ArgumentParser
+from graide.rungraphite import CorpusShaper
+from graide.baseline import recordBaseline, diffBaseline
+
+
+def asBool(txt) :
+    if not txt : return False
+    if txt.lower() == 'true' : return True
+    if txt.isdigit() : return int(txt) != 0
+    return False
+
+class TestCase(object) :
+
+    def __init__(self, fname, group, name, text, feats = None, lang = None, rtl = False, expand = 100,
+                 groupIndex = 0, index = 0) :
+        self.file = fname
+        self.group = group
+        self.groupIndex = groupIndex    # position of the group in the file, and of the test in the group
+        self.index = index
+        self.name = name or text
+        self.text = text
+        self.feats = feats or {}
+        self.lang = lang
+        self.rtl = rtl
+        self.expand = expand
+
+    def job(self) :
+        return (self.text, self.feats, 1 if self.rtl else 0, self.lang, self.expand)
+
+
+# Read the tests from a test file, as TestList.loadTests does.
+def readTests(fname) :
+    root = et.parse(fname).getroot()
+    res = []
+    if root.tag == 'tests' :
+        # old-style file
+        for (i, t) in enumerate(root.iterfind('test')) :
+            feats = {}
+            for ft in (t.get('feats') or "").split(" ") :
+                if '=' in ft :
+                    (k, v) = ft.split('=')
+                    feats[k] = int(v)
+            txt = t.text
+            if not txt :
+                y = t.find('text')
+                txt = y.text if y is not None else ""
+            res.append(TestCase(fname, 'main', t.get('name'), txt, feats, rtl = asBool(t.get('rtl')), index = i))
+        return res
+
+    styles = {}
+    langs = {}
+    for s in root.iterfind('.//style') :
+        styleName = s.get('name')
+        styles[styleName] = {}
+        if s.get('lang') : langs[styleName] = s.get('lang')
+        for ft in (s.get('feats') or "").split(" ") :
+            if '=' in ft :
+                (k, v) = ft.split('=')
+                if v and v != "None" :
+                    styles[styleName][k] = int(v)
+    for (gi, g) in enumerate(root.iterfind('testgroup')) :
+        for (i, t) in enumerate(g.iterfind('test')) :
+            y = t.find('string')
+            if y is None : y = t.find('text')
+            txt = y.text if y is not None else ""
+            y = t.get('class')
+            feats = styles.get(y, {})
+            lang = langs.get(y)
+            w = t.get('expand')
+            res.append(TestCase(fname, g.get('label'), t.get('label'), txt, feats, lang,
+                                asBool(t.get('rtl')), int(w) if w else 100, gi, i))
+    return res
+
+# The test files of a project: the main tests file and those listed in the [data] section.
+def projectTestFiles(config) :
+    res = []
+    if config.has_option('main', 'testsfile') :
+        res.append(config.get('main', 'testsfile'))
+    if config.has_option('data', 'testfiles') :
+        res.extend(f for f in config.get('data', 'testfiles').split(';') if f and f not in res)
+    return res
+
+# Yield (test, width, slots) for each test, in order; width and slots are None for a test
+# with no text.
+def runTests(fontFileName, tests, size = 40, workers = None) :
+    shaper = CorpusShaper(fontFileName, size, workers)
+    results = shaper.shape(t.job() for t in tests)
+    try :
+        for (t, res) in zip(tests, results) :
+            (width, slots) = res if res else (None, None)
+            yield (t, width, slots)
+    finally :
+        results.close()
+        shaper.close()
+
+def writeJSON(fh, results) :
+    out = []
+    for (t, width, slots) in results :
+        out.append({
+            'file' : t.file, 'group' : t.group, 'test' : t.name, 'text' : t.text,
+            'feats' : t.feats, 'lang' : t.lang, 'rtl' : t.rtl, 'width' : width,
+            'glyphs' : [{'gid' : s['gid'], 'x' : s['origin'][0], 'y' : s['origin'][1],
+                         'advance' : s['advance'][0], 'before' : s['charinfo']['before'],
+                         'after' : s['charinfo']['after']} for s in slots or []]
+        })
+    json.dump(out, fh, ensure_ascii = False, indent = 1)
+
+def writeCSV(fh, results) :
+    w = csv.writer(fh)
+    w.writerow(('file', 'group', 'test', 'index', 'gid', 'x', 'y', 'advance', 'before', 'after'))
+    for (t, width, slots) in results :
+        for (i, s) in enumerate(slots or []) :
+            w.writerow((t.file, t.group, t.name, i, s['gid'], s['origin'][0], s['origin'][1],
+                        s['advance'][0], s['charinfo']['before'], s['charinfo']['after']))
+
+def main(argv = None) :
+    p = ArgumentParser(description = "Shape the tests of a Graide project and write the results")
+    p.add_argument("project", help = "Project configuration file")
+    p.add_argument("-t", "--tests", action = "append", help = "Test file to run (default: those of the project)")
+    p.add_argument("-o", "--output", help = "Output file; .csv for CSV, otherwise JSON (default: standard output)")
+    p.add_argument("-s", "--size", type = int, help = "Font size to shape at (default: the project's)")
+    p.add_argument("-j", "--jobs", type = int, help = "Number of threads (default: number of processors)")
+    p.add_argument("--record", metavar = "FILE", help = "Record the results as a baseline in FILE instead of writing them")
+    p.add_argument("--passes", action = "store_true", help = "Include the rules that fired in each pass in the baseline")
+    p.add_argument("--diff", metavar = "FILE", help = "Compare the results with the baseline in FILE and list the differences")
+    args = p.parse_args(argv)
+
+    config = RawConfigParser()
+    config.read(args.project)
+    basedir = os.path.dirname(os.path.abspath(args.project))
+    if not config.has_option('main', 'font') :
+        print("No font in project " + args.project)
+        return 2
+    fontFileName = os.path.join(basedir, config.get('main', 'font'))
+    size = args.size or (config.getint('main', 'size') if config.has_option('main', 'size') else 40)
+
+    tests = []
+    for f in args.tests or [os.path.join(basedir, f) for f in projectTestFiles(config)] :
+        try :
+            tests.extend(readTests(f))
+        except (IOError, OSError, et.ParseError) as err :
+            print("WARNING: could not read tests file %s: %s" % (f, err))
+
+    start = time.time()
+    if args.record :
+        recordBaseline(args.record, fontFileName, tests, size, args.passes, args.jobs)
+        sys.stderr.write("%d tests recorded in %.2fs\n" % (len(tests), time.time() - start))
+        return 0
+    if args.diff :
+        regressions = diffBaseline(args.diff, fontFileName, tests, args.jobs)
+        for r in regressions :
+            (fname, group, groupIndex, index, name) = r.test()
+            print("%8g  %-8s %s: %s/%s: %s" % (r.score, r.kind, os.path.basename(fname), group, name, r.detail))
+        sys.stderr.write("%d differences in %d tests, %.2fs\n" % (len(regressions), len(tests), time.time() - start))
+        return 1 if regressions else 0
+
+    results = list(runTests(fontFileName, tests, size, args.jobs))
+    fh = open(args.output, 'w', newline = '', encoding = 'utf-8') if args.output else sys.stdout
+    try :
+        if args.output and args.output.lower().endswith('.csv') :
+            writeCSV(fh, results)
+        else :
+            writeJSON(fh, results)
+    finally :
+        if args.output : fh.close()
+    sys.stderr.write("%d tests shaped in %.2fs\n" % (len(tests), time.time() - start))
+    return 0
+
+if __name__ == '__main__' :
+    sys.exit(main())
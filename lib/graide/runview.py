@@ -302,6 +302,7 @@ class RunView(QtCore.QObject, ModelSuper) :
             tselect.cursor.movePosition(QtGui.QTextCursor.NextCharacter,
                     QtGui.QTextCursor.KeepAnchor, self._gindices[newSel + 1] - self._gindices[newSel] - 2 )
             s.append(tselect)
+            self.run.fixIndex(self.currselection)
             selectedSlot = self.run[self.currselection]
             self.slotSelected.emit(selectedSlot, self, doubleClick)
             self.glyphSelected.emit(self._font[selectedSlot.gid], self, doubleClick)
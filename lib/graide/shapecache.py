@@ -0,0 +1,195 @@
+#    Copyright 2026, SIL International
+#    All rights reserved.
+#
+#    This library is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published
+#    by the Free Software Foundation; either version 2.1 of License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should also have received a copy of the GNU Lesser General Public
+#    License along with this library in the file named "LICENSE".
+#    If not, write to the Free Software Foundation, 51 Franklin Street,
+#    suite 500, Boston, MA 02110-1335, USA or visit their web page on the 
+#    internet at http://www.fsf.org/licenses/lgpl.html.
+
+from collections import OrderedDict
+import hashlib, json, sqlite3, zlib, time
+
+# Return a hash of the contents of a font file, used to tell builds of a font apart.
+def fontHash(fontname) :
+    h = hashlib.sha1()
+    f = open(fontname, 'rb')
+    while True :
+        data = f.read(1 << 20)
+        if not data : break
+        h.update(data)
+    f.close()
+    return h.hexdigest()
+
+
+# Return a cache key for shaping the text with the given font and settings.
+def shapeKey(fontKey, text, feats, lang, rtl, size, expand, trace = True) :
+    return (fontKey, text, frozenset((feats or {}).items()), lang or None, bool(rtl), size, expand, trace)
+
+
+# An in-memory cache of shaping results, evicting the least recently used entries once
+# their estimated total size goes over the limit (in bytes).
+class ShapeCache(object) :
+
+    def __init__(self, limit = 64 << 20, store = None) :
+        self.limit = limit
+        self.store = store              # ShapeStore backing this cache, if any
+        self.entries = OrderedDict()   # key -> (result, size)
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) :
+        entry = self.entries.get(key)
+        if entry is None :
+            text = self.store.get(key) if self.store else None
+            if text is None :
+                self.misses += 1
+                return None
+            result = json.loads(text)
+            self._add(key, result, len(text))
+            self.hits += 1
+            return result
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    # text is the JSON form of the result; if given, the result is saved to the store too.
+    def put(self, key, result, size, text = None) :
+        if self.store and text is not None :
+            self.store.put(key, text)
+        self._add(key, result, size)
+
+    def _add(self, key, result, size) :
+        if size > self.limit : return
+        old = self.entries.pop(key, None)
+        if old is not None : self.total -= old[1]
+        self.entries[key] = (result, size)
+        self.total += size
+        while self.total > self.limit :
+            (k, (r, s)) = self.entries.popitem(last = False)
+            self.total -= s
+
+    def clear(self) :
+        self.entries.clear()
+        self.total = 0
+
+    def __len__(self) :
+        return len(self.entries)
+
+# end of class ShapeCache
+
+
+# Turn a shapeKey into a string that is the same from one session to the next.
+def storeKey(key) :
+    (fontKey, text, feats, lang, rtl, size, expand, trace) = key
+    feats = sorted([str(k.decode() if isinstance(k, bytes) else k), v] for (k, v) in feats)
+    txt = json.dumps([fontKey, text, feats, str(lang) if lang else None, rtl, size, expand, trace])
+    return hashlib.sha1(txt.encode('utf-8')).hexdigest()
+
+
+# Shaping results kept on disk in an SQLite database between sessions, as compressed JSON.
+# Only results for one build of the font are kept: setFont throws away everything else.
+# Once the data goes over the size limit (in bytes) the least recently used go first.
+# Writing to the database is left to flush, which the application calls when it is idle:
+# new results and the times of use are kept here until then (or until batch results are
+# waiting), so that shaping does not wait on the disk and reading does not leave a write
+# transaction open while another Graide or runtests is using the same store.
+class ShapeStore(object) :
+
+    def __init__(self, fname, limit = 256 << 20, batch = 200) :
+        self.fname = fname
+        self.limit = limit
+        self.batch = batch
+        self.fontKey = None
+        self.used = {}          # store key -> time of use, not yet written back
+        self.pending = {}       # store key -> (font key, text, time), not yet written
+        self.db = sqlite3.connect(fname)
+        self.db.execute("CREATE TABLE IF NOT EXISTS shapes (key TEXT PRIMARY KEY, font TEXT, "
+                        "data BLOB, size INTEGER, used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS shapes_used ON shapes (used)")
+        self.db.commit()
+        self.total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM shapes").fetchone()[0]
+
+    def setFont(self, fontKey) :
+        if fontKey == self.fontKey : return
+        self.fontKey = fontKey
+        self.used = {}
+        self.pending = dict((k, v) for (k, v) in self.pending.items() if v[0] == fontKey)
+        self.db.execute("DELETE FROM shapes WHERE font != ?", (fontKey,))
+        self.db.commit()
+        self.total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM shapes").fetchone()[0]
+
+    def get(self, key) :
+        skey = storeKey(key)
+        entry = self.pending.get(skey)
+        if entry is not None : return entry[1]
+        row = self.db.execute("SELECT data FROM shapes WHERE key = ?", (skey,)).fetchone()
+        if row is None : return None
+        self.used[skey] = time.time()
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, key, text) :
+        skey = storeKey(key)
+        self.used.pop(skey, None)
+        self.pending[skey] = (key[0], text, time.time())
+        if len(self.pending) >= self.batch :
+            self.flush()
+
+    # Write the new results and times of use to the database in one transaction. If the
+    # database is busy they are kept for the next time.
+    def flush(self) :
+        if not self.db or not (self.pending or self.used) : return
+        try :
+            self._write()
+        except sqlite3.Error :
+            self.db.rollback()
+            self.total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM shapes").fetchone()[0]
+            raise
+        self.used = {}
+        self.pending = {}
+
+    def _write(self) :
+        if self.used :
+            self.db.executemany("UPDATE shapes SET used = ? WHERE key = ?",
+                                [(t, k) for (k, t) in self.used.items()])
+        for (skey, (fontKey, text, used)) in self.pending.items() :
+            data = zlib.compress(text.encode('utf-8'))
+            if len(data) > self.limit : continue
+            row = self.db.execute("SELECT size FROM shapes WHERE key = ?", (skey,)).fetchone()
+            if row is not None : self.total -= row[0]
+            self.db.execute("INSERT OR REPLACE INTO shapes VALUES (?, ?, ?, ?, ?)",
+                            (skey, fontKey, sqlite3.Binary(data), len(data), used))
+            self.total += len(data)
+        while self.total > self.limit :
+            row = self.db.execute("SELECT key, size FROM shapes ORDER BY used LIMIT 1").fetchone()
+            if row is None : break
+            self.db.execute("DELETE FROM shapes WHERE key = ?", (row[0],))
+            self.total -= row[1]
+        self.db.commit()
+
+    def clear(self) :
+        self.used = {}
+        self.pending = {}
+        self.db.execute("DELETE FROM shapes")
+        self.db.commit()
+        self.total = 0
+
+    def close(self) :
+        if self.db :
+            self.flush()
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+# end of class ShapeStore
@@ -20,7 +20,7 @@
 
 from qtpy import QtCore
 from graide.attribview import Attribute, AttribModel
-from graide.utils import copyobj, DataObj
+from graide.utils import DataObj
 from graide.layout import Layout
 import traceback
 
@@ -30,6 +30,8 @@ def getVal(p, *parms) :
     else :
         return str(p)
 
+_unset = object()
+
 class Results(object) :
     def __init__(self, r, v, c) :
         self.ranges = r
@@ -38,6 +40,15 @@ class Results(object) :
 
 class Slot(DataObj) :
 
+    # The keys graphite gives for a slot in its JSON output, which become attributes of the
+    # slot; any other keys go in the instance dictionary. Attributes from the JSON are only
+    # present if graphite gave them, hence the hasattr tests in attribModel.
+    infoKeys = ('id', 'gid', 'charinfo', 'origin', 'advance', 'shift', 'insert', 'break',
+                'justification', 'user', 'parent', 'collision')
+    stateKeys = ('index', 'highlighted', 'highlightType', 'px', 'pxExcl', 'advancedView',
+                 'colPending', 'colKernPending', 'colKern', 'colRemoves', 'colResults')
+    __slots__ = infoKeys + stateKeys + ('__dict__',)
+
     def __init__(self, info = {}, advancedView = False) :
 
         self.highlighted = False
@@ -57,16 +68,20 @@ class Slot(DataObj) :
         self.colResults = {}
 
 
+    # A shallow copy, except that the collision dictionary is copied and the collision
+    # removals and results start empty; the copy takes over any pixmap from this slot.
     def copy(self) :
-        res = Slot()
-        copyobj(self, res)
+        res = Slot.__new__(Slot)
+        for k in Slot.infoKeys + Slot.stateKeys :
+            v = getattr(self, k, _unset)
+            if v is not _unset : setattr(res, k, v)
+        res.__dict__.update(self.__dict__)
         if hasattr(self, 'collision') :
             res.collision = self.collision.copy() # otherwise slot copies will shared this dict!
         self.px = None
         self.pxExcl = None
         res.colRemoves = {'x' : [], 'y' : [], 's' : [], 'd' : []}
         res.colResults = {}
-        res.advancedView = self.advancedView
         #self.highlighted = False
         #self.highlightType = ""
         return res
@@ -654,6 +654,18 @@ class TestList(QtWidgets.QWidget) :
     def selectTest(self, groupIndex, testIndex) :
         self.recordCurrentTest()
         self.app.setRun(self.testGroups[groupIndex][testIndex])
+
+    # Select the given test of the given file and make it the current run; used to go to a
+    # test from elsewhere, e.g. the list of differences from a baseline.
+    def showTest(self, fname, groupIndex, testIndex) :
+        for (fileIndex, f) in enumerate(self.testFiles) :
+            if os.path.basename(f) == os.path.basename(fname) :
+                self.selectCurrentTest("%d.%d.%d" % (fileIndex, groupIndex, testIndex))
+                if groupIndex < len(self.testGroups) and testIndex < len(self.testGroups[groupIndex]) :
+                    self.selectTest(groupIndex, testIndex)
+                    return True
+                return False
+        return False
         
     def recordCurrentTest(self) :
         fileIndex = self.fcombo.currentIndex()
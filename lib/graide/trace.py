@@ -0,0 +1,158 @@
+#    Copyright 2026, SIL International
+#    All rights reserved.
+#
+#    This library is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published
+#    by the Free Software Foundation; either version 2.1 of License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should also have received a copy of the GNU Lesser General Public
+#    License along with this library in the file named "LICENSE".
+#    If not, write to the Free Software Foundation, 51 Franklin Street,
+#    suite 500, Boston, MA 02110-1335, USA or visit their web page on the 
+#    internet at http://www.fsf.org/licenses/lgpl.html.
+
+
+
+# A column view of the graphite debug JSON for one segment. Each stage of the trace (Init,
+# the output of each pass, and the final output, as in the rows of the Passes tab) has its
+# slots turned into NumPy columns the first time it is asked for, so that questions about
+# the whole trace are answered with array operations rather than walking dicts and lists.
+# Nothing here uses Qt, so it can be used over the traces of a whole test corpus.
+
+import numpy as np
+
+class TraceStage(object) :
+
+    # columns, one entry per slot:
+    #   gid, id     glyph id, and the slot id as an index into Trace.ids
+    #   x, y        origin
+    #   adv         x advance
+    #   colx, coly  collision offset (0 if the slot has no collision information)
+    #   hascol      whether the slot has collision information
+    #   flags       collision flags (0 if none)
+    def __init__(self, slots, idIndex) :
+        n = len(slots)
+        gid = np.zeros(n, dtype=np.int32)
+        ids = np.zeros(n, dtype=np.int32)
+        pos = np.zeros((n, 5), dtype=np.float64)     # x, y, adv, colx, coly
+        hascol = np.zeros(n, dtype=bool)
+        flags = np.zeros(n, dtype=np.int32)
+        for i, s in enumerate(slots) :
+            gid[i] = s['gid']
+            sid = s['id']
+            ids[i] = idIndex.setdefault(sid, len(idIndex))
+            origin = s.get('origin')
+            if origin : pos[i, 0:2] = origin[0:2]
+            advance = s.get('advance')
+            if advance : pos[i, 2] = advance[0]
+            col = s.get('collision')
+            if col is not None :
+                hascol[i] = True
+                if 'offset' in col : pos[i, 3:5] = col['offset'][0:2]
+                flags[i] = col.get('flags', 0)
+        self.gid = gid
+        self.id = ids
+        self.x = pos[:, 0]
+        self.y = pos[:, 1]
+        self.adv = pos[:, 2]
+        self.colx = pos[:, 3]
+        self.coly = pos[:, 4]
+        self.hascol = hascol
+        self.flags = flags
+
+    def __len__(self) :
+        return len(self.gid)
+
+    # For each slot of this stage, the index of the slot with the same id in other, or -1.
+    def matchIn(self, other) :
+        if not len(other) or not len(self) :
+            return np.full(len(self), -1, dtype=np.intp)
+        order = np.argsort(other.id, kind='stable')
+        sortedIds = other.id[order]
+        pos = np.searchsorted(sortedIds, self.id)
+        pos[pos >= len(sortedIds)] = 0
+        return np.where(sortedIds[pos] == self.id, order[pos], -1)
+
+# end of class TraceStage
+
+
+class Trace(object) :
+
+    # json is the debug output for one segment, as in the list that graphite logs.
+    def __init__(self, json = None) :
+        if not json :
+            json = {'passes' : [], 'output' : []}
+        self.json = json
+        self.ids = {}           # slot id string -> index used in the id columns
+        self._stages = [None] * self.numStages()
+
+    def numStages(self) :
+        return len(self.json['passes']) + 1     # 0 = Init, the last is the final output
+
+    def stageSlots(self, j) :
+        if j < len(self.json['passes']) :
+            return self.json['passes'][j]['slots']
+        return self.json['output']
+
+    def stage(self, j) :
+        if j < 0 : j += len(self._stages)
+        res = self._stages[j]
+        if res is None :
+            res = self._stages[j] = TraceStage(self.stageSlots(j), self.ids)
+        return res
+
+    # Whether the output of pass j differs in glyphs or positions from its input.
+    def changed(self, j) :
+        if j == 0 : return False
+        prev = self.stage(j - 1)
+        this = self.stage(j)
+        if len(prev) != len(this) : return True
+        return bool(np.any(prev.gid != this.gid) or np.any(prev.x != this.x)
+                        or np.any(prev.y != this.y) or np.any(prev.adv != this.adv))
+
+    # A boolean array over the stages, True for those passes that changed anything.
+    def changedStages(self) :
+        return np.array([self.changed(j) for j in range(self.numStages())], dtype=bool)
+
+    # The slots that collision fixing in pass j moved, judged by the collision offsets of
+    # the slots compared with those of the same slots going into the pass. Returns the
+    # indices of the moved slots in the output of the pass and an (n, 2) array of how far
+    # each moved.
+    def collisionMoves(self, j) :
+        if j == 0 :
+            return (np.zeros(0, dtype=np.intp), np.zeros((0, 2)))
+        prev = self.stage(j - 1)
+        this = self.stage(j)
+        if not np.any(this.hascol) :
+            return (np.zeros(0, dtype=np.intp), np.zeros((0, 2)))
+        (prevx, prevy) = self._prevOffsets(prev, this)
+        dx = this.colx - prevx
+        dy = this.coly - prevy
+        moved = np.flatnonzero(this.hascol & ((dx != 0) | (dy != 0)))
+        return (moved, np.column_stack((dx[moved], dy[moved])))
+
+    # The collision moves of every stage, as a list indexed like the stages.
+    def allCollisionMoves(self) :
+        return [self.collisionMoves(j) for j in range(self.numStages())]
+
+    def collisionChanged(self, j) :
+        return len(self.collisionMoves(j)[0]) > 0
+
+    # The collision offsets that the slots of this had going into the pass; 0 for new slots.
+    def _prevOffsets(self, prev, this) :
+        m = this.matchIn(prev)
+        if not len(prev) :
+            return (np.zeros(len(this)), np.zeros(len(this)))
+        found = m >= 0
+        return (np.where(found, prev.colx[m], 0.), np.where(found, prev.coly[m], 0.))
+
+    def finalGids(self) :
+        return self.stage(-1).gid
+
+# end of class Trace
@@ -17,7 +17,7 @@
 #    suite 500, Boston, MA 02110-1335, USA or visit their web page on the 
 #    internet at http://www.fsf.org/licenses/lgpl.html.
 
-import os, subprocess, re, sys
+import os, subprocess, re, sys, json, hashlib
 from tempfile import mktemp
 from shutil import copyfile
 from qtpy import QtCore, QtGui, QtWidgets
@@ -26,7 +26,15 @@ from xml.etree import cElementTree as XmlTree
 mainapp = None
 pendingErrors = []
 
+# Lines in the compiler's error file, eg:
+#       myfile.gdl(34) : error(103: unexpected token: )
+#       error(139): Parsing failed
+gdlErrorFileLineRe = re.compile(r'^(.*?)\((\d+)\) : (error|warning)\((\d+)\): (.*)$')
+gdlErrorLineRe = re.compile(r'(error|warning)\((\d+)\): (.*)$')
+
 class DataObj(object) :
+
+    __slots__ = ()  # so that subclasses can use __slots__
     
     def attribModel(self) :
         return None
@@ -59,12 +67,6 @@ def configintval(config, section, option) :
     else :
         return 0
 
-def copyobj(src, dest) :
-    for x in dir(src) :
-        y = getattr(src, x)
-        if not callable(y) and not x.startswith('__') :
-            setattr(dest, x, y)
-
 grcompiler = None
 def findgrcompiler() :
     global grcompiler
@@ -104,135 +106,275 @@ def findgrcompiler() :
         print("...found in " + grcompiler)
 
 # Return 0 if successful.
-def buildGraphite(config, app, font, fontFileName, lowLevelErrFile = None, gdlErrFileName = None) :
-    global grcompiler
+def buildGraphite(config, app, font, fontFileName, lowLevelErrFile = None, gdlErrFileName = None, basedir = None) :
+    build = GraphiteBuild(config, app, font, fontFileName, gdlErrFileName, basedir)
+    res = build.prepare()
+    if res is not None :
+        return res
 
-    #print("buildGraphite")
+    parms = {}
+    if lowLevelErrFile :
+        parms['stderr'] = subprocess.STDOUT
+        parms['stdout'] = lowLevelErrFile
 
-    # Prevent the error-reporting mechanism from interpreting this file as legitimate output
-    # in case the entire call fails. (This assumes that the full path to the file is provided,
-    # which the caller currently does.)
+    res = 1
     try:
-        os.remove(gdlErrFileName)
+        print("Compiling...")
+        res = subprocess.call(build.args, **parms)
     except:
-        pass
+        print("error in running compiler")
 
-    if configintval(config, 'build', 'usemakegdl') :
-        gdlFileName = configval(config, 'build', 'makegdlfile')  # auto-generated GDL
-
-        if config.has_option('main', 'ap') and not configval(config, 'build', 'apronly'):    # AP XML file
-            # Generate the AP GDL file.
-            apFilename = config.get('main', 'ap')
-            font.saveAP(apFilename, gdlFileName)
-            if app : app.updateFileEdit(apFilename)
-
-        cmd = configval(config, 'build', 'makegdlcmd')
-        if cmd and cmd.strip() :
-            # Call the make command to perform makegdl.
-            makecmd = expandMakeCmd(config, cmd)
-            print(makecmd)
-            subprocess.call(makecmd, shell = True)
+    #print("compilation result =", res)
+    return build.finish(res)
+
+
+# The steps of building a font, so that the compiler itself can be run either synchronously
+# (buildGraphite) or in the background. prepare() generates the GDL and returns a result if
+# the build is over without running the compiler; otherwise the caller runs the command line
+# in args and passes its exit status to finish().
+# Files named in the configuration are relative to basedir if one is given, otherwise to the
+# current directory; giving it allows several projects to be built at once.
+class GraphiteBuild(object) :
+
+    def __init__(self, config, app, font, fontFileName, gdlErrFileName = None, basedir = None, force = False) :
+        self.config = config
+        self.basedir = basedir
+        self.force = force      # build even if the manifest says the font is current
+        self.app = app
+        self.font = font
+        self.fontFileName = fontFileName
+        self.gdlErrFileName = gdlErrFileName
+        self.args = None
+        self.tempFontFileIn = None
+
+    def path(self, fname) :
+        if fname and self.basedir :
+            return os.path.join(self.basedir, fname)
+        return fname
+
+    def prepare(self) :
+        global grcompiler
+
+        #print("buildGraphite")
+        config = self.config
+        app = self.app
+        font = self.font
+        fontFileName = self.fontFileName
+        gdlErrFileName = self.gdlErrFileName
+
+        if configintval(config, 'build', 'usemakegdl') :
+            gdlFileName = self.path(configval(config, 'build', 'makegdlfile'))  # auto-generated GDL
+
+            if config.has_option('main', 'ap') and not configval(config, 'build', 'apronly'):    # AP XML file
+                # Generate the AP GDL file.
+                apFilename = self.path(config.get('main', 'ap'))
+                font.saveAP(apFilename, gdlFileName)
+                if app : app.updateFileEdit(apFilename)
+
+            cmd = configval(config, 'build', 'makegdlcmd')
+            if cmd and cmd.strip() :
+                # Call the make command to perform makegdl.
+                makecmd = expandMakeCmd(config, cmd, self.basedir)
+                print(makecmd)
+                subprocess.call(makecmd, shell = True, cwd = self.basedir)
+            else :
+                # Use the default makegdl process.
+                font.createClasses()
+                font.calculatePointClasses()
+                font.ligClasses()
+                attPassNum = int(config.get('build', 'attpass'))
+                f = open(gdlFileName, "w")
+                font.outGDL(f)
+                if attPassNum > 0 : font.outPosRules(f, attPassNum)
+                if configval(config, 'build', 'gdlfile') :
+                    f.write('\n\n#include "%s"\n' % (os.path.abspath(self.path(config.get('build', 'gdlfile')))))
+                f.close()
+                if app : app.updateFileEdit(gdlFileName)
         else :
-            # Use the default makegdl process.
-            font.createClasses()
-            font.calculatePointClasses()
-            font.ligClasses()
-            attPassNum = int(config.get('build', 'attpass'))
-            f = open(gdlFileName, "w")
-            font.outGDL(f)
-            if attPassNum > 0 : font.outPosRules(f, attPassNum)
-            if configval(config, 'build', 'gdlfile') :
-                f.write('\n\n#include "%s"\n' % (os.path.abspath(config.get('build', 'gdlfile'))))
+            gdlFileName = self.path(configval(config, 'build', 'gdlfile'))
+
+        if not gdlFileName or not os.path.exists(gdlFileName) :
+            # Report it where the caller will look for the compiler's errors, in the form
+            # of the compiler's own error lines so that it gets listed.
+            f = open(gdlErrFileName or self.path('gdlerr.txt'), 'w')
+            if not gdlFileName :
+                f.write("error(0): No GDL File specified. Build failed\n")
+            else :
+                f.write("error(0): No such GDL file: \"%s\". Build failed\n" % gdlFileName)
             f.close()
-            if app : app.updateFileEdit(gdlFileName)
-    else :
-        gdlFileName = configval(config, 'build', 'gdlfile')
+            return True
+        
+        #tweakWarning = generateTweakerGDL(config, app)
+        #if tweakWarning != "" :
+        #    app.tab_errors.addWarning(tweakWarning)
+        #    app.tab_errors.setBringToFront(True)
+
+        if config.has_option('build', 'grcexecutable') and configval(config, 'build', 'grcexecutable') != "":
+            # Call the compiler they specified:
+            grcExec = configval(config, 'build', 'grcexecutable')
+        else:
+            grcExec = grcompiler
+
+        if config.has_option('build', 'ignorewarnings') :
+            warningList = configval(config, 'build', 'ignorewarnings')
+            warningList = warningList.replace(' ', '')
+            if warningList == 'none' :
+                warningList = ['-wall']
+            elif warningList == '' :
+                warningList = ['-w510', '-w3521']  # warnings to ignore by default
+            else :
+                warningList = warningList.replace(',', ' -w')
+                warningList = "-w" + warningList
+                warningList = warningList.split(' ')
+        else:
+            warningList = ['-w510', '-w3521']  # warnings to ignore by default
+
+        # If nothing that goes into the build has changed since the last successful one,
+        # the font and its debug files are already up to date.
+        flags = warningList + (["-e", gdlErrFileName] if gdlErrFileName else []) + ["-D", "-q"]
+        self.manifestFile = os.path.splitext(fontFileName)[0] + '.manifest'
+        self.manifest = buildManifest(config, grcExec, flags, gdlFileName, self.basedir)
+        if not self.force and buildIsCurrent(self.manifestFile, self.manifest, fontFileName, gdlErrFileName) :
+            print("Build is up to date")
+            return 0
+
+        if grcExec is None :
+            print("grcompiler is missing")
+            return 1
+
+        # Prevent the error-reporting mechanism from interpreting this file as legitimate output
+        # in case the entire call fails. (This assumes that the full path to the file is provided,
+        # which the caller currently does.)
+        removeFile(gdlErrFileName)
+        removeFile(self.manifestFile)
 
-    if not gdlFileName or not os.path.exists(gdlFileName) :
-        f = open('gdlerr.txt' ,'w')
-        if not gdlFileName :
-            f.write("No GDL File specified. Build failed")
+        self.tempFontFileIn = mktemp()
+        if config.has_option('build', 'usettftable') :  # unimplemented
+            subprocess.call(("ttftable", "-delete", "graphite", fontFileName , self.tempFontFileIn))
         else :
-            f.write("No such GDL file: \"%s\". Build failed" % gdlFileName)
-        f.close()
-        return True
-        
-    cwd = os.getcwd()
-    sourcePath = os.path.dirname(os.path.abspath(gdlFileName))
-    pathToCwd = pathFromTo(sourcePath, cwd)  # prepend this to existing paths
-
-    #tweakWarning = generateTweakerGDL(config, app)
-    #if tweakWarning != "" :
-    #    app.tab_errors.addWarning(tweakWarning)
-    #    app.tab_errors.setBringToFront(True)
-        
-    tempFontFileIn = mktemp()
-    if config.has_option('build', 'usettftable') :  # unimplemented
-        subprocess.call(("ttftable", "-delete", "graphite", fontFileName , tempFontFileIn))
-    else :
-        copyfile(fontFileName, tempFontFileIn)
+            copyfile(fontFileName, self.tempFontFileIn)
 
-    parms = {}
-    if lowLevelErrFile :
-        parms['stderr'] = subprocess.STDOUT
-        parms['stdout'] = lowLevelErrFile
+        self.args = [grcExec] + flags + [gdlFileName, self.tempFontFileIn, fontFileName]
+        return None
 
-    if config.has_option('build', 'grcexecutable') and configval(config, 'build', 'grcexecutable') != "":
-        # Call the compiler they specified:
-        grcExec = configval(config, 'build', 'grcexecutable')
-    else:
-        grcExec = grcompiler
-
-    if config.has_option('build', 'ignorewarnings') :
-        warningList = configval(config, 'build', 'ignorewarnings')
-        warningList = warningList.replace(' ', '')
-        if warningList == 'none' :
-            warningList = ['-wall']
-        elif warningList == '' :
-            warningList = ['-w510', '-w3521']  # warnings to ignore by default
+    def finish(self, res) :
+        if res:
+            # failure in compilation - restore the previous version of the font
+            copyfile(self.tempFontFileIn, self.fontFileName)
         else :
-            warningList = warningList.replace(',', ' -w')
-            warningList = "-w" + warningList
-            warningList = warningList.split(' ')
-    else:
-        warningList = ['-w510', '-w3521']  # warnings to ignore by default
+            writeManifest(self.manifestFile, self.manifest, self.fontFileName)
 
-    res = 1
-    if grcExec is not None:
-        try:
-            # Change the current working directory to the one where the GDL file is located.
-            # This is done to account for a bug in the compiler that interprets #include statements
-            # as relative to the CWD rather than the main source file (happens only on Windows).
-            # -- NO LONGER NEEDED; the compiler has been fixed.
-            #gdlFileBase = os.path.basename(gdlFileName)
-            #tempFontFileIn = os.path.abspath(tempFontFileIn)
-            #fontFileName_src = pathToCwd + os.path.relpath(fontFileName)
-            #os.chdir(sourcePath)
-
-            print("Compiling...")
-            argList = [grcExec]
-            argList.extend(warningList)
-            if gdlErrFileName is not None and gdlErrFileName != "":
-                argList.extend(["-e", gdlErrFileName])
-            argList.extend(["-D", "-q", gdlFileName, tempFontFileIn, fontFileName])
-
-            res = subprocess.call(argList, **parms)
-        except:
-            print("error in running compiler")
-    else:
-        print("grcompiler is missing")
+        os.remove(self.tempFontFileIn)
 
-    #os.chdir(cwd)  # return to where we were - NOT NEEDED
+        return res
+
+# end of class GraphiteBuild
 
-    #print("compilation result =", res)
 
-    if res:
-        # failure in compilation - restore the previous version of the font
-        copyfile(tempFontFileIn, fontFileName)
+def removeFile(fname) :
+    try:
+        os.remove(fname)
+    except:
+        pass
 
-    os.remove(tempFontFileIn)
 
-    return res
+# The build manifest records a hash of everything that determines the compiled font: the
+# GDL source files, including those pulled in through #include, the AP file, the compiler
+# and its options, and the font produced. It is written next to the font after a successful
+# build, and a build whose manifest still matches does not need to run the compiler.
+# If an #include cannot be read or found, the manifest is marked incomplete and the build
+# is never taken to be current.
+
+manifestVersion = 2
+includeLineRe = re.compile(r'^[ \t]*#[ \t]*include\b(.*)$', re.M)
+includeArgRe = re.compile(r'^[ \t]*(?:"([^"]+)"|<([^>]+)>)[ \t]*;?[ \t]*(?://.*|/\*.*)?$')
+
+def fileHash(fname) :
+    try :
+        h = hashlib.sha1()
+        with open(fname, 'rb') as f :
+            for chunk in iter(lambda : f.read(1 << 20), b'') :
+                h.update(chunk)
+        return h.hexdigest()
+    except (IOError, OSError) :
+        return None
+
+# Return the main GDL file and all the files it includes, directly or indirectly, and
+# whether every file could be read and every include understood and found.
+# An include is looked for relative to the including file, then basedir (or the current
+# directory), then each of searchDirs, such as the compiler's own directory for stddef.gdh.
+def gdlSourceFiles(gdlFileName, basedir = None, searchDirs = ()) :
+    res = []
+    complete = True
+    todo = [os.path.abspath(gdlFileName)]
+    while todo :
+        fname = todo.pop()
+        if fname in res : continue
+        res.append(fname)
+        try :
+            with open(fname, 'rb') as f :
+                text = f.read().decode('utf-8', 'replace').replace('\r', '')
+        except (IOError, OSError) :
+            complete = False
+            continue
+        base = os.path.dirname(fname)
+        for arg in includeLineRe.findall(text) :
+            m = includeArgRe.match(arg)
+            if not m :
+                complete = False
+                continue
+            inc = m.group(1) or m.group(2)
+            for d in (base, basedir or "") + tuple(searchDirs) :
+                incFile = os.path.join(d, inc)
+                if os.path.exists(incFile) :
+                    todo.append(os.path.abspath(incFile))
+                    break
+            else :
+                complete = False
+    return (res, complete)
+
+def buildManifest(config, grcExec, flags, gdlFileName, basedir = None) :
+    try :
+        st = os.stat(grcExec)
+        compiler = [os.path.abspath(grcExec), st.st_size, st.st_mtime]
+    except (TypeError, OSError) :
+        compiler = None
+    (files, complete) = gdlSourceFiles(gdlFileName, basedir,
+                                       [os.path.dirname(compiler[0])] if compiler else [])
+    apFileName = configval(config, 'main', 'ap')
+    if apFileName : files.append(os.path.abspath(os.path.join(basedir or "", apFileName)))
+    return {
+        'version' : manifestVersion,
+        'complete' : complete,
+        'compiler' : compiler,
+        'flags' : flags,
+        'usemakegdl' : configintval(config, 'build', 'usemakegdl'),
+        'files' : dict((f, fileHash(f)) for f in files)
+    }
+
+def buildIsCurrent(manifestFile, manifest, fontFileName, gdlErrFileName) :
+    if not manifest['compiler'] or not manifest['complete'] : return False
+    try :
+        with open(manifestFile) as f :
+            old = json.load(f)
+    except (IOError, OSError, ValueError) :
+        return False
+    font = old.pop('font', None)
+    if old != manifest or font != fileHash(fontFileName) :
+        return False
+    # The compiler's debug and error output must still be there.
+    if not os.path.exists(os.path.splitext(fontFileName)[0] + '.gdx') :
+        return False
+    return not gdlErrFileName or os.path.exists(gdlErrFileName)
+
+def writeManifest(manifestFile, manifest, fontFileName) :
+    manifest = dict(manifest)
+    manifest['font'] = fileHash(fontFileName)
+    try :
+        with open(manifestFile, 'w') as f :
+            json.dump(manifest, f, indent = 1, sort_keys = True)
+    except (IOError, OSError) as err :
+        print("WARNING: could not write build manifest " + manifestFile + ": " + str(err))
 
 
 replacements = {
@@ -243,7 +385,7 @@ replacements = {
     'p' : ['build', 'attpass']
 }
 
-def expandMakeCmd(config, txt) :
+def expandMakeCmd(config, txt, basedir = None) :
     ###return re.sub(r'%([afgip])', lambda m: os.path.abspath(configval(config, *replacements[m.group(1)])), txt)
     for key, val in replacements.items() :
         cval = configval(config, val[0], val[1])
@@ -258,7 +400,7 @@ def expandMakeCmd(config, txt) :
         elif cval == None :
             txt = txt.replace('%'+key, "[missing filename]")
         else :
-            txt = txt.replace('%'+key, os.path.abspath(cval))
+            txt = txt.replace('%'+key, os.path.abspath(os.path.join(basedir or "", cval)))
     return txt
 
 